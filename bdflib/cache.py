@@ -0,0 +1,199 @@
+# bdflib, a library for working with BDF font files
+# Copyright (C) 2009, Timothy Alle
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A persistent cache of parsed fonts, so BDF files needn't be re-parsed.
+"""
+import hashlib
+import marshal
+import os
+import tempfile
+from bdflib import reader, util
+
+# Bump this whenever the layout of cache entries changes, so old entries are
+# ignored rather than misread.
+CACHE_VERSION = 2
+
+# The default upper limit on the total size of a cache directory, in bytes.
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+# The environment variable that turns on caching for read_bdf().
+CACHE_DIR_VARIABLE = "BDFLIB_CACHE_DIR"
+
+# The suffix for the files that hold cache entries.
+ENTRY_SUFFIX = ".bdfcache"
+
+
+class FontCache(object):
+	"""
+	A directory of pre-parsed fonts.
+
+	Each BDF file gets one entry, named after its absolute path (or two, if
+	it's read both with and without keep_source). An entry records the size
+	and modification time of the file it came from, and is ignored (and
+	replaced) if the file changes. When the cache grows larger than max_size
+	bytes, the least-recently used entries are removed.
+	"""
+
+	def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+		self.directory = directory
+		self.max_size = max_size
+
+	def _entry_path(self, filename, keep_source=False):
+		key = os.path.abspath(filename)
+		if keep_source:
+			key += "\0source"
+		key = hashlib.sha1(key).hexdigest()
+		return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+	def _load(self, entry, stamp):
+		"""
+		Returns the font stored in the given entry, or None.
+		"""
+		try:
+			with open(entry, 'rb') as handle:
+				version, entryStamp, data = marshal.load(handle)
+		except (IOError, OSError, EOFError, ValueError, TypeError):
+			return None
+
+		if version != CACHE_VERSION or entryStamp != stamp:
+			return None
+
+		# Mark this entry as recently used.
+		try:
+			os.utime(entry, None)
+		except OSError:
+			pass
+
+		return reader.font_from_tuple(data)
+
+	def _store(self, entry, stamp, font):
+		"""
+		Save the given font in the given entry.
+
+		Raises EnvironmentError if the entry can't be written.
+		"""
+		try:
+			os.makedirs(self.directory)
+		except OSError:
+			# Most likely it already exists, perhaps because another process
+			# just created it.
+			if not os.path.isdir(self.directory):
+				raise
+
+		# Write to a temporary file and rename it into place, so that other
+		# processes never see a half-written entry.
+		handle, tempName = tempfile.mkstemp(suffix=".tmp",
+				dir=self.directory)
+		try:
+			with os.fdopen(handle, 'wb') as stream:
+				marshal.dump((CACHE_VERSION, stamp, reader.font_to_tuple(font)),
+						stream)
+			os.rename(tempName, entry)
+		except:
+			try:
+				os.unlink(tempName)
+			except OSError:
+				pass
+			raise
+
+		self.evict()
+
+	def read_bdf(self, filename, keep_source=False):
+		"""
+		Read the BDF font in the given file, from the cache if possible.
+
+		keep_source is the same as for reader.read_bdf(); the sources are
+		cached along with everything else.
+		"""
+		info = os.stat(filename)
+		stamp = (info.st_size, info.st_mtime)
+		entry = self._entry_path(filename, keep_source)
+
+		font = self._load(entry, stamp)
+		if font is None:
+			with util.open_font(filename) as stream:
+				font = reader.read_bdf_bytes(stream.read(),
+						keep_source=keep_source)
+			try:
+				self._store(entry, stamp, font)
+			except EnvironmentError:
+				# The cache is only an optimisation; a directory we can't
+				# write to shouldn't stop the font from being read.
+				pass
+
+		return font
+
+	def evict(self):
+		"""
+		Remove the least-recently used entries until the cache is small enough.
+		"""
+		entries = []
+		total = 0
+		for name in os.listdir(self.directory):
+			if not name.endswith(ENTRY_SUFFIX):
+				continue
+			path = os.path.join(self.directory, name)
+			try:
+				info = os.stat(path)
+			except OSError:
+				# Some other process removed it.
+				continue
+			entries.append((info.st_mtime, info.st_size, path))
+			total += info.st_size
+
+		entries.sort()
+		for mtime, size, path in entries:
+			if total <= self.max_size:
+				break
+			try:
+				os.unlink(path)
+			except OSError:
+				pass
+			total -= size
+
+	def clear(self):
+		"""
+		Remove every entry from the cache.
+		"""
+		if not os.path.isdir(self.directory):
+			# Nothing's been cached yet.
+			return
+
+		for name in os.listdir(self.directory):
+			if name.endswith(ENTRY_SUFFIX):
+				os.unlink(os.path.join(self.directory, name))
+
+
+def read_bdf(filename, cache_dir=None, max_size=DEFAULT_MAX_SIZE,
+		keep_source=False):
+	"""
+	Read the BDF font in the given file, using a FontCache if one is set up.
+
+	cache_dir is the cache directory to use. If it is not given, the
+	BDFLIB_CACHE_DIR environment variable is used instead, and if that's not
+	set either, the font is just parsed. keep_source is the same as for
+	reader.read_bdf().
+	"""
+	if cache_dir is None:
+		cache_dir = os.environ.get(CACHE_DIR_VARIABLE)
+
+	if not cache_dir:
+		with util.open_font(filename) as stream:
+			return reader.read_bdf_bytes(stream.read(),
+					keep_source=keep_source)
+
+	return FontCache(cache_dir, max_size).read_bdf(filename, keep_source)
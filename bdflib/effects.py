@@ -35,9 +35,6 @@ def merge(base, custom):
 
 	for cp in base.codepoints():
 		if cp not in res:
-			old_glyph = base[cp]
-			res.new_glyph_from_data(old_glyph.name, old_glyph.get_data(),
-					old_glyph.bbX, old_glyph.bbY, old_glyph.bbW, old_glyph.bbH,
-					old_glyph.advance, old_glyph.codepoint)
+			res.add_glyph(base[cp].copy())
 
 	return res
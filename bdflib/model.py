@@ -17,6 +17,17 @@
 """
 Classes to represent a bitmap font in BDF format.
 """
+import array
+import binascii
+import math
+import operator
+import struct
+import sys
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
 # There are more reliable sources than BDF properties for these settings, so
 # we'll ignore attempts to set them.
 IGNORABLE_PROPERTIES = [
@@ -27,6 +38,456 @@ IGNORABLE_PROPERTIES = [
 		"RESOLUTION_Y",
 	]
 
+# Bitmap rows that are exactly as wide as a machine integer can be decoded and
+# packed in bulk by the struct module. Keyed by the number of hex digits in
+# each row.
+_ROW_FORMATS = {2: "B", 4: "H", 8: "I", 16: "Q"}
+
+# Whether array items need their bytes swapping to be most significant first.
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+# Other rows up to eight bytes wide can be widened to one of those first.
+# Keyed by the number of bytes in each row, to the number they're widened to.
+_WIDER_ROWS = {3: 4, 5: 8, 6: 8, 7: 8}
+
+
+def decode_bitmap(block, rowCount, width):
+	"""
+	Decode a glyph bitmap from a string of hex digits.
+
+	block should contain rowCount rows of the same number of hex digits, top
+	row first, with nothing in between them. width is the number of pixels
+	in each row. Returns a list of integers in the order used by Glyph.data
+	(bottom row first), or None if block can't be decoded that way.
+	"""
+	if rowCount == 0:
+		return None
+
+	digits, extra = divmod(len(block), rowCount)
+	paddingbits = digits * 4 - width
+	if extra or paddingbits < 0:
+		return None
+
+	code = _ROW_FORMATS.get(digits)
+	try:
+		if code is not None:
+			res = list(struct.unpack(">%d%s" % (rowCount, code),
+					binascii.unhexlify(block)))
+			res.reverse()
+			if paddingbits:
+				res = [row >> paddingbits for row in res]
+		elif digits // 2 in _WIDER_ROWS and not digits % 2:
+			# Widen each row to the next size struct can unpack, by copying
+			# each column of bytes across to its place in the wider rows.
+			rowBytes = digits // 2
+			size = _WIDER_ROWS[rowBytes]
+			data = binascii.unhexlify(block)
+			wide = bytearray(size * rowCount)
+			for i in range(rowBytes):
+				wide[size - rowBytes + i::size] = data[i::rowBytes]
+			res = list(struct.unpack(">%d%s" % (rowCount,
+					_ROW_FORMATS[size * 2]), str(wide)))
+			res.reverse()
+			if paddingbits:
+				res = [row >> paddingbits for row in res]
+		else:
+			value = int(block, 16) >> paddingbits
+			rowBits = digits * 4
+			mask = (1 << width) - 1
+			res = [value >> (rowBits * i) & mask for i in range(rowCount)]
+	except (TypeError, ValueError, binascii.Error):
+		return None
+
+	return res
+
+
+def encode_bitmap(data, width):
+	"""
+	Encode a glyph bitmap as rows of hex digits.
+
+	data should be a list of integers in the order used by Glyph.data (bottom
+	row first), each no more than width bits wide. Returns a list of strings
+	of hex digits, top row first, with each row padded out to a whole number
+	of bytes as BDF requires.
+	"""
+	# How many bytes do we need to represent the bits in each row?
+	rowWidth, extraBits = divmod(width, 8)
+
+	# How many bits of padding do we need to round up to a full byte?
+	if extraBits > 0:
+		rowWidth += 1
+		paddingBits = 8 - extraBits
+	else:
+		paddingBits = 0
+
+	# rowWidth is the number of bytes, but Python wants the number of
+	# nybbles, so multiply by 2.
+	digits = rowWidth * 2
+
+	# data goes bottom-to-top like any proper coordinate system does, but the
+	# result wants to be top-to-bottom like any proper stream-output.
+	if type(data) is ArenaRows:
+		data = data.copy()
+	rows = data[::-1]
+
+	# Compact rows that fill their array items exactly are already laid out
+	# the way we want, give or take the byte order.
+	if (not paddingBits and isinstance(rows, array.array)
+			and rows.itemsize == rowWidth and rows):
+		if _LITTLE_ENDIAN:
+			rows.byteswap()
+		block = binascii.hexlify(rows.tostring()).upper()
+		return [block[i:i + digits] for i in range(0, len(block), digits)]
+	if paddingBits:
+		rows = [row << paddingBits for row in rows]
+
+	code = _ROW_FORMATS.get(digits)
+	if code is not None and rows:
+		try:
+			block = binascii.hexlify(struct.pack(">%d%s" % (len(rows), code),
+					*rows)).upper()
+		except struct.error:
+			# Some row doesn't fit, so format them one at a time below.
+			pass
+		else:
+			return [block[i:i + digits]
+					for i in range(0, len(block), digits)]
+
+	return ["%0*X" % (digits, row) for row in rows]
+
+
+def pack_bitmap(data, width, rowBytes=None):
+	"""
+	Pack a glyph bitmap into a string of bytes.
+
+	data and width are the same as for encode_bitmap(). The rows come out
+	top row first, each padded out to rowBytes bytes (by default, as few as
+	hold width pixels) with the leftmost pixel in the most significant bit
+	of the first byte.
+	"""
+	if rowBytes is None:
+		rowBytes = (width + 7) // 8
+	if rowBytes == 0 or not data:
+		return ""
+
+	shift = rowBytes * 8 - width
+	mask = (1 << width) - 1
+	rows = [(row & mask) << shift for row in reversed(data)]
+
+	code = _ROW_FORMATS.get(rowBytes * 2)
+	if code is not None:
+		return struct.pack(">%d%s" % (len(rows), code), *rows)
+
+	return binascii.unhexlify("".join("%0*X" % (rowBytes * 2, row)
+			for row in rows))
+
+
+# The unsigned array types glyph rows can be stored in, as (bits, typecode)
+# pairs from narrowest to widest.
+_ROW_TYPECODES = []
+for _code in "BHIL":
+	_bits = array.array(_code).itemsize * 8
+	if _bits not in [bits for bits, code in _ROW_TYPECODES]:
+		_ROW_TYPECODES.append((_bits, _code))
+del _code, _bits
+
+
+class Rows(array.array):
+	"""
+	The rows of a glyph bitmap, stored compactly.
+
+	This is an array.array that also compares equal to a list of the same
+	integers, so code written for Glyph.data being a list keeps working.
+	"""
+	__slots__ = ()
+
+	def __eq__(self, other):
+		if isinstance(other, list):
+			return self.tolist() == other
+		return array.array.__eq__(self, other)
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __add__(self, other):
+		if isinstance(other, list):
+			return self.tolist() + other
+		return array.array.__add__(self, other)
+
+	def __radd__(self, other):
+		if isinstance(other, list):
+			return other + self.tolist()
+		return NotImplemented
+
+	def __iadd__(self, other):
+		if isinstance(other, list):
+			self.extend(other)
+			return self
+		return array.array.__iadd__(self, other)
+
+
+def make_rows(data, width):
+	"""
+	Returns the bitmap rows in data in the most compact form that fits.
+
+	data should be a sequence of integers, and width the number of pixels in
+	each row. The result is a Rows array of the narrowest type that can hold
+	rows of that width (or any wider rows in data), or a list if no array
+	type is wide enough. Rows arrays and ArenaRows views are returned as-is.
+	"""
+	if type(data) is Rows or type(data) is ArenaRows:
+		return data
+
+	if data:
+		try:
+			width = max(width, max(data).bit_length())
+		except (AttributeError, TypeError):
+			width = None
+
+	if width is not None:
+		for bits, code in _ROW_TYPECODES:
+			if width <= bits:
+				try:
+					return Rows(code, data)
+				except (OverflowError, TypeError):
+					# Negative rows, say.
+					break
+
+	if type(data) is list:
+		return data
+	return list(data)
+
+
+# The array types that hold rows of each size in bytes exactly.
+_ROW_ARRAY_CODES = dict((bits // 8, code) for bits, code in _ROW_TYPECODES)
+
+
+def decode_rows(block, rowCount, width):
+	"""
+	Decode a glyph bitmap from a string of hex digits, as compact rows.
+
+	The arguments are the same as for decode_bitmap(), and so is the result,
+	except that the rows are in the form make_rows() gives them. Rows padded
+	out to the size of an array item are copied straight into an array, so
+	this is quicker than decoding them and then calling make_rows().
+	"""
+	rowBytes = (width + 7) // 8
+	code = _ROW_ARRAY_CODES.get(rowBytes)
+	if code is not None and rowCount and len(block) == rowCount * rowBytes * 2:
+		try:
+			rows = Rows(code, binascii.unhexlify(block))
+		except (TypeError, binascii.Error):
+			return None
+		if _LITTLE_ENDIAN:
+			rows.byteswap()
+		rows.reverse()
+		paddingbits = rowBytes * 8 - width
+		if paddingbits:
+			rows = Rows(code, [row >> paddingbits for row in rows])
+		return rows
+
+	rows = decode_bitmap(block, rowCount, width)
+	if rows is None:
+		return None
+	return make_rows(rows, width)
+
+
+def _copy_rows(data):
+	"""
+	Returns a copy of some bitmap rows, in the same form.
+
+	ArenaRows views are copied to somewhere else in the same arena.
+	"""
+	if type(data) is ArenaRows:
+		return data.arena.store(data, 0)
+	elif isinstance(data, array.array):
+		return Rows(data.typecode, data.tostring())
+	return list(data)
+
+
+# The slice that reverses a sequence, like encode_bitmap() does.
+_REVERSED = slice(None, None, -1)
+
+
+class ArenaRows(object):
+	"""
+	The rows of a glyph bitmap, stored in a BitmapArena.
+
+	This behaves like a Rows array, but reads and writes the arena's buffer
+	rather than having storage of its own. Slicing with a step of 1 gives
+	another view of the same rows; other slices are copied into a Rows array.
+	Pickling a view pickles a copy of its rows, not the arena.
+	"""
+	__slots__ = ("arena", "offset", "count", "typecode", "itemsize")
+
+	def __init__(self, arena, offset, count, typecode):
+		self.arena = arena
+		self.offset = offset
+		self.count = count
+		self.typecode = typecode
+		self.itemsize = struct.calcsize(typecode)
+
+	def __len__(self):
+		return self.count
+
+	def _position(self, index):
+		if index < 0:
+			index += self.count
+		if not 0 <= index < self.count:
+			raise IndexError("row index out of range")
+		return self.offset + index * self.itemsize
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			if index == _REVERSED:
+				rows = self.copy()
+				rows.reverse()
+				return rows
+
+			start, stop, step = index.indices(self.count)
+			if step == 1:
+				return ArenaRows(self.arena, self.offset + start * self.itemsize,
+						max(0, stop - start), self.typecode)
+			rows = self.copy()
+			res = Rows(self.typecode)
+			res.fromstring(rows[index].tostring())
+			return res
+
+		return struct.unpack_from(self.typecode, self.arena.buffer,
+				self._position(index))[0]
+
+	def __setitem__(self, index, value):
+		if isinstance(index, slice):
+			raise TypeError("ArenaRows views can't be assigned slices")
+		struct.pack_into(self.typecode, self.arena.buffer,
+				self._position(index), value)
+
+	def __iter__(self):
+		return iter(self.tolist())
+
+	def __reversed__(self):
+		return reversed(self.tolist())
+
+	def __eq__(self, other):
+		if isinstance(other, (ArenaRows, array.array, list)):
+			return self.tolist() == list(other)
+		return NotImplemented
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __add__(self, other):
+		if isinstance(other, list):
+			return self.tolist() + other
+		return NotImplemented
+
+	def __radd__(self, other):
+		if isinstance(other, list):
+			return other + self.tolist()
+		return NotImplemented
+
+	def __repr__(self):
+		return "ArenaRows(%r, %r)" % (self.typecode, self.tolist())
+
+	def __reduce__(self):
+		return (Rows, (self.typecode, self.tolist()))
+
+	def tolist(self):
+		return list(struct.unpack_from("%d%s" % (self.count, self.typecode),
+				self.arena.buffer, self.offset))
+
+	def tostring(self):
+		return str(self.arena.buffer[self.offset:
+				self.offset + self.count * self.itemsize])
+
+	def copy(self):
+		"""
+		Returns a Rows array holding a copy of these rows.
+		"""
+		res = Rows(self.typecode)
+		res.fromstring(buffer(self.arena.buffer, self.offset,
+				self.count * self.itemsize))
+		return res
+
+
+class BitmapArena(object):
+	"""
+	The bitmap rows of many glyphs, packed into one bytearray.
+
+	Each glyph's rows are stored in native byte order, in items of the size
+	make_rows() would choose, starting at a multiple of that size. Storing
+	more rows grows the buffer; nothing is ever removed, so a font's arena is
+	compacted by copying its glyphs into a new one (see Font.compact_arena()).
+	"""
+
+	def __init__(self):
+		self.buffer = bytearray()
+
+	def store(self, data, width):
+		"""
+		Copy the given rows into the arena, and returns a view of them.
+
+		data and width are the same as for make_rows(). Returns None if the
+		rows are too wide to store in an array.
+		"""
+		rows = make_rows(data, width)
+		if isinstance(rows, ArenaRows):
+			rows = rows.copy()
+		elif not isinstance(rows, array.array):
+			return None
+
+		itemsize = rows.itemsize
+		padding = -len(self.buffer) % itemsize
+		if padding:
+			self.buffer.extend("\0" * padding)
+		offset = len(self.buffer)
+		self.buffer.extend(rows.tostring())
+
+		return ArenaRows(self, offset, len(rows), rows.typecode)
+
+
+def _need_numpy(feature):
+	if numpy is None:
+		raise ImportError("%s needs NumPy" % (feature,))
+
+
+def _frame_bits(rows, width):
+	"""
+	Returns the pixels in an array of rows as an array of 0s and 1s.
+
+	rows should be a NumPy array of integer rows, bottom row first along the
+	last axis. The result has an extra axis of width pixels, leftmost first,
+	and its rows run top row first.
+	"""
+	shifts = numpy.arange(width - 1, -1, -1, dtype=rows.dtype)
+	return ((rows[..., ::-1, numpy.newaxis] >> shifts) & 1).astype(numpy.uint8)
+
+
+def _metric_property(slot, doc, changed=None):
+	"""
+	Returns a property for one of a glyph's bounding box metrics.
+
+	The metric is stored in the given slot, and the font that owns the
+	glyph hears about changes to it, so it can keep its bounding box up to
+	date. If changed is given, it's called with the glyph after every change.
+	"""
+	def set_metric(self, value):
+		self._ink = None
+		owner = self._owner
+		if owner is None:
+			setattr(self, slot, value)
+		elif getattr(self, slot) != value:
+			left = self._bbX
+			bottom = self._bbY
+			right = left + self._bbW
+			top = bottom + self._bbH
+			setattr(self, slot, value)
+			owner._glyph_resized(self, left, bottom, right, top)
+		if changed is not None:
+			changed(self)
+
+	return property(operator.attrgetter(slot), set_metric, doc=doc)
+
 
 class GlyphExists(Exception):
 	pass
@@ -35,20 +496,60 @@ class GlyphExists(Exception):
 class Glyph(object):
 	"""
 	Represents a font glyph and associated properties.
+
+	The bitmap rows in data are stored compactly (see make_rows()), with
+	room for rows as wide as the glyph. Making the glyph wider makes room
+	for wider rows, but a row can't be changed in place to something wider
+	than the glyph; make the glyph wider first, or assign a new list of rows.
 	"""
 
+	# Large fonts have a great many glyphs, so don't give each one a dict.
+	# _owner is the font this glyph was most recently added to, which needs
+	# to hear when the glyph's bounding box changes, or the glyph is
+	# renamed. _source is the BDF text this glyph was read from, the data it
+	# had then, and its other attributes at the time; see set_source().
+	# _shared is true if _data might be shared with a copy of this glyph; see
+	# copy(). _ink caches the metrics of the pixels that are set, along with
+	# the data they were worked out from and whether that had no bits set
+	# outside the bitmap; see _ink_metrics(). Changing the bounding box
+	# clears it.
+	__slots__ = ("_name", "_bbX", "_bbY", "_bbW", "_bbH", "advance",
+			"codepoint", "_data", "_owner", "_source", "_shared", "_ink")
+
+	def _fit_rows(self):
+		# Rows are stored in the narrowest type that fits the glyph's width
+		# when they're assigned, so a wider glyph may need a wider type.
+		data = self._data
+		if (isinstance(data, (array.array, ArenaRows))
+				and data.itemsize * 8 < self._bbW):
+			self._replace_rows(make_rows(data.tolist(), self._bbW))
+
+	bbX = _metric_property("_bbX",
+			"The distance from the origin to the left of the bitmap.")
+	bbY = _metric_property("_bbY",
+			"The distance from the origin to the bottom of the bitmap.")
+	bbW = _metric_property("_bbW", "The width of the bitmap, in pixels.",
+			_fit_rows)
+	bbH = _metric_property("_bbH", "The height of the bitmap, in pixels.")
+
 	def __init__(self, name, data=None, bbX=0, bbY=0, bbW=0, bbH=0,
 			advance=0, codepoint=None):
 		"""
 		Initialise this glyph object.
 		"""
-		self.name = name
-		self.bbX = bbX
-		self.bbY = bbY
-		self.bbW = bbW
-		self.bbH = bbH
+		self._owner = None
+		self._source = None
+		self._shared = False
+		self._ink = None
+		self._name = name
+		self._bbX = bbX
+		self._bbY = bbY
+		self._bbW = bbW
+		self._bbH = bbH
 		if data is None:
-			self.data = []
+			# Readers usually assign the real rows straight away, so don't
+			# bother making these compact.
+			self._data = []
 		else:
 			self._set_data(data)
 		self.advance = advance
@@ -80,7 +581,7 @@ class Glyph(object):
 			res_row = []
 			# Find the data row associated with this output row.
 			if self.bbY <= y < self.bbY + self.bbH:
-				data_row = self.data[y - self.bbY]
+				data_row = self._data[y - self.bbY]
 			else:
 				data_row = 0
 			for x in range(bitmap_min_X, bitmap_max_X + 1):
@@ -97,110 +598,447 @@ class Glyph(object):
 
 		return "\n".join(res)
 
-	def _set_data(self, data):
-		self.data = []
-		for row in data:
-			paddingbits = len(row) * 4 - self.bbW
-			self.data.append(int(row, 16) >> paddingbits)
+	def _get_name(self):
+		return self._name
 
-		# Make the list indices match the coordinate system
-		self.data.reverse()
+	def _set_name(self, name):
+		if self._owner is not None:
+			self._owner._glyph_renamed(self)
+		self._name = name
 
-	def get_data(self):
-		res = []
+	name = property(_get_name, _set_name)
+
+	def _get_rows(self):
+		if self._shared:
+			# Whoever asked might change the rows in place, so they'd better
+			# be ours alone.
+			self._replace_rows(_copy_rows(self._data))
+		# For the same reason, the source and ink metrics can't be trusted
+		# any more.
+		self._source = None
+		self._ink = None
+		return self._data
+
+	def _set_rows(self, data):
+		self._data = make_rows(data, self.bbW)
+		self._shared = False
 
-		# How many bytes do we need to represent the bits in each row?
-		rowWidth, extraBits = divmod(self.bbW, 8)
+	data = property(_get_rows, _set_rows, doc="""
+			The bitmap rows, bottom row first, as integers with the leftmost
+			pixel in the most significant of the low bbW bits.
 
-		# How many bits of padding do we need to round up to a full byte?
-		if extraBits > 0:
-			rowWidth += 1
-			paddingBits = 8 - extraBits
+			Since the rows might be changed in place, reading this makes the
+			glyph forget its source and ink metrics (see get_source() and
+			get_ink_bounding_box()).
+
+			If you hold on to the rows and change them later, call
+			mark_modified() afterwards.
+			""")
+
+	def _set_data(self, data):
+		data = list(data)
+		block = "".join(data)
+
+		# BDF bitmap rows are all the same width, so we can usually decode the
+		# whole bitmap in one go and split it into rows afterward.
+		if data and len(block) == len(data[0]) * len(data):
+			rows = decode_rows(block, len(data), self.bbW)
 		else:
-			paddingBits = 0
+			rows = None
+
+		if rows is None:
+			# Decode the rows one at a time.
+			rows = []
+			for row in data:
+				row = row.strip()
+				paddingbits = len(row) * 4 - self.bbW
+				rows.append(int(row, 16) >> paddingbits)
 
-		for row in self.data:
-			# rowWidth is the number of bytes, but Python wants the number of
-			# nybbles, so multiply by 2.
-			res.append("%0*X" % (rowWidth*2, row << paddingBits))
+			# Make the list indices match the coordinate system
+			rows.reverse()
 
-		# self.data goes bottom-to-top like any proper coordinate system does,
-		# but res wants to be top-to-bottom like any proper stream-output.
-		res.reverse()
+		self.data = rows
 
+	def __getstate__(self):
+		# Don't drag the whole font along when pickling a glyph. _shared is
+		# kept, since a copy of this glyph might be pickled along with it.
+		state = {"data": self._data}
+		for name in Glyph.__slots__:
+			if name not in ("_data", "_owner", "_ink"):
+				state[name] = getattr(self, name)
+		state.update(getattr(self, "__dict__", {}))
+		return state
+
+	def __setstate__(self, state):
+		self._owner = None
+		self._source = None
+		self._ink = None
+		for name, value in state.iteritems():
+			setattr(self, name, value)
+		# Setting data clears this, whichever order it came in.
+		self._shared = state.get("_shared", False)
+
+	def get_data(self):
+		return encode_bitmap(self._data, self.bbW)
+
+	def copy(self):
+		"""
+		Returns a copy of this glyph, which doesn't belong to any font.
+
+		The copy shares this glyph's bitmap rows rather than copying them,
+		until either glyph's data is used or replaced.
+		"""
+		res = Glyph.__new__(Glyph)
+		res._owner = None
+		res._name = self._name
+		res._bbX = self.bbX
+		res._bbY = self.bbY
+		res._bbW = self.bbW
+		res._bbH = self.bbH
+		res.advance = self.advance
+		res.codepoint = self.codepoint
+		res._data = self._data
+		res._source = self._source
+		res._ink = self._ink
+		res._shared = self._shared = True
 		return res
 
+	def _replace_rows(self, rows):
+		"""
+		Swap in a different copy of the same rows.
+
+		Unlike assigning to data, this doesn't make the source out of date.
+		"""
+		old = self._data
+		self._data = rows
+		self._shared = False
+		if self._source is not None and self._source[1] is old:
+			text, data, attributes, pixel_size = self._source
+			self._source = (text, rows, attributes, pixel_size)
+		if self._ink is not None and self._ink[0] is old:
+			data, metrics, clean = self._ink
+			self._ink = (rows, metrics, clean)
+
+	def detach(self):
+		"""
+		Give this glyph its own copy of its rows, if they're in an arena.
+		"""
+		if type(self._data) is ArenaRows:
+			self._replace_rows(self._data.copy())
+
 	def get_bounding_box(self):
 		return (self.bbX, self.bbY, self.bbW, self.bbH)
 
+	def _source_attributes(self):
+		return (self.name, self.codepoint, self.advance, self.bbX, self.bbY,
+				self.bbW, self.bbH)
+
+	def set_source(self, text, pixel_size=None):
+		"""
+		Record the BDF text this glyph was read from.
+
+		text should run from STARTCHAR to ENDCHAR inclusive, with a newline
+		at the end. For as long as the glyph is unmodified, the writer will
+		copy text out rather than formatting the glyph all over again.
+
+		The SWIDTH in text depends on the pixel size of the font it was
+		written for, so pixel_size should be given if it's known (see
+		Font.get_pixel_size()).
+		"""
+		self._source = (text, self._data, self._source_attributes(),
+				pixel_size)
+
+	def get_source(self, pixel_size=None):
+		"""
+		Returns the BDF text this glyph was read from.
+
+		Returns None if the glyph has been modified since, or if it wasn't
+		read with its source kept in the first place. If pixel_size is given,
+		also returns None if the text was written for a font of a different
+		pixel size, since its SWIDTH would be wrong.
+
+		Setting attributes, assigning new data or calling merge_glyph() all
+		make the source out of date. So does reading self.data, since the
+		rows might then be changed in place; get_data() leaves it alone.
+		"""
+		if self._source is None:
+			return None
+
+		text, data, attributes, source_pixel_size = self._source
+		if data is not self._data or attributes != self._source_attributes():
+			self._source = None
+			return None
+
+		if (pixel_size is not None and source_pixel_size is not None
+				and pixel_size != source_pixel_size):
+			return None
+
+		return text
+
+	def mark_modified(self):
+		"""
+		Forget the BDF text this glyph was read from, and its ink metrics.
+		"""
+		self._source = None
+		self._ink = None
+
 	def merge_glyph(self, other, atX, atY):
+		# Work from the slots rather than the metric properties, which are
+		# slow to read and write in bulk. other may well be self, so read
+		# everything before changing anything.
+		bbX = self._bbX
+		bbY = self._bbY
+		bbW = self._bbW
+		bbH = self._bbH
+		other_bbX = atX + other._bbX
+		other_bbY = atY + other._bbY
+		other_bbW = other._bbW
+		other_bbH = other._bbH
+
 		# Calculate the new metrics
-		new_bbX = min(self.bbX, atX + other.bbX)
-		new_bbY = min(self.bbY, atY + other.bbY)
-		new_bbW = max(self.bbX + self.bbW,
-				atX + other.bbX + other.bbW) - new_bbX
-		new_bbH = max(self.bbY + self.bbH,
-				atY + other.bbY + other.bbH) - new_bbY
+		new_bbX = min(bbX, other_bbX)
+		new_bbY = min(bbY, other_bbY)
+		new_right = max(bbX + bbW, other_bbX + other_bbW)
+		new_bbW = new_right - new_bbX
+		new_bbH = max(bbY + bbH, other_bbY + other_bbH) - new_bbY
+
+		# Each glyph's rows need shifting left to line their right-hand
+		# edges up with the new one.
+		old_shift = new_right - (bbX + bbW)
+		other_shift = new_right - (other_bbX + other_bbW)
+
+		# The merged glyph's ink can usually be worked out from the two
+		# glyphs', rather than measured again later.
+		ink = self._merged_ink(other, atX, atY, new_bbY, new_bbH)
 
 		# Calculate the new data
+		old_rows = self._data
+		other_rows = other._data
 		new_data = []
 		for y in range(new_bbY, new_bbY + new_bbH):
 			# If the old glyph has a row here...
-			if self.bbY <= y < self.bbY + self.bbH:
-				old_row = self.data[y-self.bbY]
-
-				# If the right-hand edge of the bounding box has moved right,
-				# we'll need to left shift the old-data to get more empty space
-				# to draw the new glyph into.
-				right_edge_delta = (new_bbX + new_bbW) - (self.bbX + self.bbW)
-				if right_edge_delta > 0:
-					old_row <<= right_edge_delta
+			if bbY <= y < bbY + bbH:
+				old_row = old_rows[y - bbY] << old_shift
 			else:
 				old_row = 0
 			# If the new glyph has a row here...
-			if atY + other.bbY <= y < atY + other.bbY + other.bbH:
-				new_row = other.data[y - other.bbY - atY]
-
-				# If the new right-hand-edge ofthe bounding box
-				if atX + other.bbX + other.bbW < new_bbX + new_bbW:
-					new_row <<= ((new_bbX + new_bbW)
-							- (atX + other.bbX + other.bbW))
+			if other_bbY <= y < other_bbY + other_bbH:
+				new_row = other_rows[y - other_bbY] << other_shift
 			else:
 				new_row = 0
 			new_data.append(old_row | new_row)
 
 		# Update our properties with calculated values
-		self.bbX = new_bbX
-		self.bbY = new_bbY
-		self.bbW = new_bbW
-		self.bbH = new_bbH
+		self._bbX = new_bbX
+		self._bbY = new_bbY
+		self._bbW = new_bbW
+		self._bbH = new_bbH
 		self.data = new_data
+		self._source = None
+		if ink is None:
+			self._ink = None
+		else:
+			self._ink = (self._data, ink, True)
 
-	def get_ascent(self):
-		res = self.bbY + self.bbH
+		# The glyph can only have got bigger, so the font's bounding box
+		# just needs to grow to fit.
+		if self._owner is not None:
+			self._owner._glyph_grew(self)
 
-		# Each empty row at the top of the bitmap should not be counted as part
-		# of the ascent.
-		for row in self.data[::-1]:
-			if row != 0:
-				break
-			else:
-				res -= 1
+	def _merged_ink(self, other, atX, atY, bbY, bbH):
+		"""
+		Returns the ink metrics of this glyph with other merged in, or None.
+
+		bbY and bbH are those of the merged glyph. This glyph's metrics are
+		only used if they're already cached, so nothing is measured unless
+		they've been asked for before; other's are cached if they aren't.
+		"""
+		if not self._bbW or not self._bbH:
+			mine = None
+			clean = not self._data or not max(self._data) >> self._bbW
+		elif self._ink is None or self._ink[0] is not self._data:
+			return None
+		else:
+			data, mine, clean = self._ink
+			if mine[3] == 0:
+				mine = None
+		theirs = other._ink_metrics()
+		if theirs[3] == 0:
+			theirs = None
+
+		# Bits outside a bitmap don't count as ink, but merging may bring
+		# them inside the new one.
+		if not clean or not other._ink[2]:
+			return None
+
+		if mine is None and theirs is None:
+			return [bbY, -bbY - bbH, (0, 0, 0, 0), 0]
+
+		if theirs is not None:
+			box = theirs[2]
+			if box is not None:
+				box = (box[0] + atX, box[1] + atY, box[2], box[3])
+			theirs = [theirs[0] + atY, theirs[1] - atY, box, theirs[3]]
+			if mine is None:
+				return theirs
+		else:
+			return list(mine)
+
+		box = None
+		if mine[2] is not None and theirs[2] is not None:
+			left = min(mine[2][0], theirs[2][0])
+			bottom = min(mine[2][1], theirs[2][1])
+			right = max(mine[2][0] + mine[2][2], theirs[2][0] + theirs[2][2])
+			top = max(mine[2][1] + mine[2][3], theirs[2][1] + theirs[2][3])
+			box = (left, bottom, right - left, top - bottom)
+
+		# Where the two glyphs overlap, adding up their pixel counts would
+		# count some pixels twice, so that's left to be measured.
+		return [max(mine[0], theirs[0]), max(mine[1], theirs[1]), box, None]
+
+	def to_array(self, packed=False):
+		"""
+		Returns this glyph's bitmap as a 2-D NumPy array, top row first.
+
+		Each element is a pixel: 1 if it's set, 0 if not. If packed is true,
+		each element is a byte of eight pixels instead, leftmost in the most
+		significant bit, with each row padded out to a whole number of bytes
+		as in BDF. Needs NumPy.
+		"""
+		_need_numpy("Glyph.to_array()")
+		rowBytes = (self.bbW + 7) // 8
+
+		if not rowBytes or not self.bbH:
+			if packed:
+				return numpy.zeros((self.bbH, rowBytes), numpy.uint8)
+			return numpy.zeros((self.bbH, self.bbW), numpy.uint8)
+
+		mask = (1 << self.bbW) - 1
+		block = binascii.unhexlify("".join(encode_bitmap(
+				[row & mask for row in self._data], self.bbW)))
+		res = numpy.frombuffer(block, numpy.uint8).reshape(self.bbH, rowBytes)
+		if packed:
+			return res.copy()
+		return numpy.unpackbits(res, axis=1)[:, :self.bbW].copy()
+
+	@classmethod
+	def from_array(cls, name, pixels, bbX=0, bbY=0, advance=0,
+			codepoint=None, width=None):
+		"""
+		Returns a new glyph with the bitmap in a 2-D NumPy array.
+
+		pixels should be top row first, like to_array() returns, with
+		non-zero elements for the pixels that are set. If width is given,
+		pixels is taken to be packed like to_array(packed=True) returns, with
+		width pixels in each row. Needs NumPy.
+		"""
+		_need_numpy("Glyph.from_array()")
+		pixels = numpy.asarray(pixels)
+		if pixels.ndim != 2:
+			raise ValueError("Glyph bitmaps should be 2-D, not %d-D"
+					% (pixels.ndim,))
+
+		if width is None:
+			height, width = pixels.shape
+			pixels = numpy.packbits(pixels != 0, axis=1)
+		else:
+			height = pixels.shape[0]
+			pixels = pixels.astype(numpy.uint8)
+
+		res = cls(name, None, bbX, bbY, width, height, advance, codepoint)
+		if width and height:
+			rows = decode_bitmap(binascii.hexlify(pixels.tobytes()), height,
+					width)
+			if rows is None:
+				raise ValueError("%d bytes per row can't hold %d pixels"
+						% (pixels.shape[1], width))
+			res.data = rows
+		else:
+			res.data = [0] * height
 
 		return res
 
+	def _ink_rows(self):
+		"""
+		Returns the rows, as a list or array, without bits outside the bitmap.
+		"""
+		rows = self._data
+		if type(rows) is ArenaRows:
+			rows = rows.tolist()
+		if rows and max(rows) >> self.bbW:
+			mask = (1 << self.bbW) - 1
+			rows = [row & mask for row in rows]
+		return rows
+
+	def _ink_metrics(self):
+		"""
+		Returns a list of ascent, descent, ink bounding box and pixel count.
+
+		These are cached until the data or bounding box changes. The ink
+		bounding box and pixel count are None until they're first asked for.
+		"""
+		data = self._data
+		ink = self._ink
+		if ink is not None and ink[0] is data:
+			return ink[1]
+
+		# Empty rows at the top and bottom of the bitmap don't count towards
+		# the ascent or descent.
+		rows = data
+		if type(rows) is ArenaRows:
+			rows = rows.tolist()
+		clean = not rows or not max(rows) >> self.bbW
+		if not clean:
+			rows = self._ink_rows()
+		bottom = 0
+		top = len(rows)
+		while bottom < top and not rows[bottom]:
+			bottom += 1
+		while top > bottom and not rows[top - 1]:
+			top -= 1
+
+		if bottom < top:
+			metrics = [self.bbY + top, -self.bbY - bottom, None, None]
+		else:
+			metrics = [self.bbY, -self.bbY - self.bbH, (0, 0, 0, 0), 0]
+
+		self._ink = (data, metrics, clean)
+		return metrics
+
+	def get_ascent(self):
+		return self._ink_metrics()[0]
+
 	def get_descent(self):
-		res =  -1 * self.bbY
+		return self._ink_metrics()[1]
 
-		# Each empty row at the bottom of the bitmap should not be counted as
-		# part of the descent.
-		for row in self.data:
-			if row != 0:
-				break
-			else:
-				res -= 1
+	def get_ink_bounding_box(self):
+		"""
+		Returns the bounding box of the pixels that are set in this glyph.
 
-		return res
+		The result is a tuple of (bbX, bbY, bbW, bbH) like
+		get_bounding_box(), or (0, 0, 0, 0) if no pixels are set. Like the
+		ascent and descent, it's worked out once and kept until the glyph
+		changes.
+		"""
+		metrics = self._ink_metrics()
+		if metrics[2] is None:
+			ascent, descent = metrics[:2]
+			union = reduce(operator.or_, self._ink_rows())
+			left = self.bbW - union.bit_length()
+			right = self.bbW - ((union & -union).bit_length() - 1)
+			metrics[2] = (self.bbX + left, -descent, right - left,
+					ascent + descent)
+		return metrics[2]
+
+	def get_pixel_count(self):
+		"""
+		Returns the number of pixels that are set in this glyph.
+		"""
+		metrics = self._ink_metrics()
+		if metrics[3] is None:
+			metrics[3] = sum([bin(row).count("1")
+					for row in self._ink_rows()])
+		return metrics[3]
 
 
 class Font(object):
@@ -208,6 +1046,10 @@ class Font(object):
 	Represents the entire font and font-global properties.
 	"""
 
+	# The BitmapArena that holds the rows of our glyphs, if use_arena() has
+	# been called.
+	arena = None
+
 	def __init__(self, name, ptSize, xdpi, ydpi):
 		"""
 		Initialise this font object.
@@ -222,6 +1064,76 @@ class Font(object):
 		self.glyphs_by_codepoint = {}
 		self.comments = []
 
+		# Glyphs that have been removed, but are still in _glyphs until it's
+		# next compacted.
+		self._removed = set()
+
+		# A dict mapping each glyph name to a list of the glyphs with that
+		# name, in the order they were added, or None if it needs building
+		# again.
+		self._glyphsByName = None
+
+		# The left, bottom, right and top edges of the union of the origin and
+		# the bounding boxes of the first _measuredGlyphs glyphs. The rest are
+		# folded in by get_bounding_box(), so adding a glyph doesn't make us
+		# parse it if it was read lazily.
+		self._bounds = (0, 0, 0, 0)
+		self._measuredGlyphs = 0
+
+		# The highest codepoint in the font, or None if it needs to be worked
+		# out again.
+		self._maxCodepoint = -1
+
+	def _get_glyphs(self):
+		if self._removed:
+			self._compact()
+		return self._glyphs
+
+	def _set_glyphs(self, glyphs):
+		self._glyphs = glyphs
+		self._removed = set()
+
+	glyphs = property(_get_glyphs, _set_glyphs, doc="""
+		A list of all the glyphs in the font, in the order they were added.
+		""")
+
+	def _compact(self):
+		"""
+		Drop the glyphs that have been removed from _glyphs, in one pass.
+
+		The list is changed in place, so a list returned by an earlier look
+		at glyphs stays in step.
+		"""
+		removed = self._removed
+		glyphs = self._glyphs
+		measured = self._measuredGlyphs
+
+		kept = [g for g in glyphs[:measured] if g not in removed]
+		self._measuredGlyphs = len(kept)
+		kept.extend([g for g in glyphs[measured:] if g not in removed])
+
+		glyphs[:] = kept
+		self._removed = set()
+
+	def __getstate__(self):
+		# The glyphs pickle copies of their rows, so the arena would just be
+		# dead weight; a new one is made when unpickling. The name index is
+		# rebuilt when it's next needed.
+		if self._removed:
+			self._compact()
+		state = self.__dict__.copy()
+		if state.get("arena") is not None:
+			state["arena"] = True
+		state["_glyphsByName"] = None
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		for g in self.glyphs:
+			g._owner = self
+		if self.arena is not None:
+			self.compact_arena()
+
 	def add_comment(self, comment):
 		lines = str(comment).split("\n")
 		self.comments.extend(lines)
@@ -245,9 +1157,14 @@ class Font(object):
 		elif isinstance(key, str):
 			del self.properties[key]
 		elif isinstance(key, int):
-			g = self.glyphs_by_codepoint[key]
-			self.glyphs.remove(g)
-			del self.glyphs_by_codepoint[key]
+			g = self.glyphs_by_codepoint.pop(key)
+			self._removed.add(g)
+			self._glyph_removed(g)
+			if self._glyphsByName is not None:
+				named = self._glyphsByName[g.name]
+				named.remove(g)
+				if not named:
+					del self._glyphsByName[g.name]
 
 	def __contains__(self, key):
 		if isinstance(key, str):
@@ -255,21 +1172,244 @@ class Font(object):
 		elif isinstance(key, int):
 			return key in self.glyphs_by_codepoint
 
+	def remove_codepoints(self, codepoints):
+		"""
+		Remove the glyphs for all the given codepoints from this font.
+
+		Codepoints with no glyph are skipped. This is the same as deleting
+		each codepoint in turn, but the glyphs list is only compacted once,
+		so removing most of a large font is still quick.
+		"""
+		glyphsByCodepoint = self.glyphs_by_codepoint
+		glyphs = [glyphsByCodepoint.pop(codepoint)
+				for codepoint in codepoints if codepoint in glyphsByCodepoint]
+		if not glyphs:
+			return
+
+		# The same as _glyph_removed() for each glyph, without the calls.
+		onEdge = False
+		for g in glyphs:
+			if g._owner is self:
+				g._owner = None
+			if not onEdge and self._on_edge(g):
+				onEdge = True
+		if onEdge:
+			self._bounds = (0, 0, 0, 0)
+			self._measuredGlyphs = 0
+		if self._maxCodepoint not in glyphsByCodepoint:
+			self._maxCodepoint = None
+		self._glyphsByName = None
+
+		self._removed.update(glyphs)
+		self._compact()
+
+	def glyph_by_name(self, name):
+		"""
+		Returns the glyph with the given name.
+
+		If more than one glyph has that name, the first one added is
+		returned. Raises KeyError if there is no glyph with that name.
+		"""
+		if self._glyphsByName is None:
+			glyphsByName = {}
+			for g in self.glyphs:
+				named = glyphsByName.get(g.name)
+				if named is None:
+					glyphsByName[g.name] = [g]
+				else:
+					named.append(g)
+			self._glyphsByName = glyphsByName
+
+		named = self._glyphsByName.get(name)
+		if not named:
+			raise KeyError(name)
+		return named[0]
+
 	def new_glyph_from_data(self, name, data=None, bbX=0, bbY=0, bbW=0, bbH=0,
 			advance=0, codepoint=None):
 		g = Glyph(name, data, bbX, bbY, bbW, bbH, advance, codepoint)
-		self.glyphs.append(g)
+		return self.add_glyph(g)
+
+	def add_glyph(self, glyph):
+		"""
+		Add an already-constructed glyph object to this font.
+
+		A glyph should only belong to one font at a time; only the font it
+		was most recently added to keeps track of its metrics.
+		"""
+		codepoint = glyph.codepoint
 		if codepoint >= 0:
 			if codepoint in self.glyphs_by_codepoint:
 				raise GlyphExists("A glyph already exists for codepoint %r"
 						% codepoint)
 			else:
-				self.glyphs_by_codepoint[codepoint] = g
-		return g
+				self.glyphs_by_codepoint[codepoint] = glyph
+			if (self._maxCodepoint is not None
+					and codepoint > self._maxCodepoint):
+				self._maxCodepoint = codepoint
+		if glyph in self._removed:
+			# Don't lose it when the removed copy is compacted away.
+			self._compact()
+		self._glyphs.append(glyph)
+		glyph._owner = self
+		if self._glyphsByName is not None:
+			self._glyphsByName.setdefault(glyph.name, []).append(glyph)
+		if self.arena is not None:
+			self._store_in_arena(glyph)
+		return glyph
+
+	def _store_in_arena(self, glyph):
+		data = glyph._data
+		if type(data) is not ArenaRows or data.arena is not self.arena:
+			rows = self.arena.store(data, glyph.bbW)
+			if rows is not None:
+				glyph._replace_rows(rows)
+
+	def use_arena(self):
+		"""
+		Keep the rows of all our glyphs in one BitmapArena, and return it.
+
+		Each glyph's data becomes an ArenaRows view of the arena, and so does
+		the data of every glyph added later. Glyphs whose rows are too wide
+		for an array keep them in a list.
+		"""
+		if self.arena is None:
+			self.compact_arena()
+		return self.arena
+
+	def compact_arena(self):
+		"""
+		Copy the rows of all our glyphs into a new arena, and return it.
+
+		Rows left behind in the old arena by glyphs that have been removed or
+		given new data are dropped, and glyphs given new data are moved in.
+		Views of the old arena stay valid, but are no longer shared with the
+		glyphs.
+		"""
+		self.arena = BitmapArena()
+		for g in self.glyphs:
+			self._store_in_arena(g)
+		return self.arena
+
+	def release_arena(self):
+		"""
+		Give every glyph its own copy of its rows, and stop using an arena.
+		"""
+		for g in self.glyphs:
+			g.detach()
+		self.arena = None
+
+	def _glyph_grew(self, glyph):
+		"""
+		Called when the bounding box of one of our glyphs may have got bigger.
+		"""
+		left, bottom, right, top = self._bounds
+		self._bounds = (
+				min(left, glyph.bbX),
+				min(bottom, glyph.bbY),
+				max(right, glyph.bbX + glyph.bbW),
+				max(top, glyph.bbY + glyph.bbH),
+			)
+
+	def _on_edge(self, glyph):
+		"""
+		Returns true if the glyph is on the edge of the font bounding box.
+
+		If it is, the bounding box might shrink when the glyph does.
+		"""
+		left, bottom, right, top = self._bounds
+		return (glyph.bbX == left < 0 or glyph.bbY == bottom < 0
+				or glyph.bbX + glyph.bbW == right > 0
+				or glyph.bbY + glyph.bbH == top > 0)
+
+	def _glyph_resized(self, glyph, left, bottom, right, top):
+		"""
+		Called when the bounding box of one of our glyphs has changed.
+
+		left, bottom, right and top are the edges of its old bounding box.
+		"""
+		fontLeft, fontBottom, fontRight, fontTop = self._bounds
+		if ((left == fontLeft < 0 and glyph.bbX > left)
+				or (bottom == fontBottom < 0 and glyph.bbY > bottom)
+				or (right == fontRight > 0 and glyph.bbX + glyph.bbW < right)
+				or (top == fontTop > 0 and glyph.bbY + glyph.bbH < top)):
+			# The glyph has moved in from an edge of the font bounding box,
+			# which might shrink, so start again.
+			self._bounds = (0, 0, 0, 0)
+			self._measuredGlyphs = 0
+		else:
+			self._glyph_grew(glyph)
+
+	def _glyph_renamed(self, glyph):
+		"""
+		Called when one of our glyphs is about to be renamed.
+		"""
+		# Where it belongs among other glyphs with its new name depends on
+		# the order they were added, so just start again.
+		self._glyphsByName = None
+
+	def _glyph_removed(self, glyph):
+		"""
+		Called when a glyph has been removed from glyphs_by_codepoint.
+
+		_measuredGlyphs still counts it until _glyphs is compacted.
+		"""
+		if glyph._owner is self:
+			glyph._owner = None
+
+		# If the glyph was on the edge of the bounding box, the bounding box
+		# might shrink, so it needs working out again.
+		if self._on_edge(glyph):
+			self._bounds = (0, 0, 0, 0)
+			self._measuredGlyphs = 0
+
+		if glyph.codepoint == self._maxCodepoint:
+			self._maxCodepoint = None
+
+	def get_bounding_box(self):
+		"""
+		Returns the union of the origin and all the glyph bounding boxes.
+
+		The result is a tuple of (bbX, bbY, bbW, bbH), like
+		Glyph.get_bounding_box(). It is kept up to date as glyphs are added,
+		changed and removed, so it's usually cheap to ask for.
+		"""
+		glyphs = self.glyphs
+		while self._measuredGlyphs < len(glyphs):
+			self._glyph_grew(glyphs[self._measuredGlyphs])
+			self._measuredGlyphs += 1
+
+		left, bottom, right, top = self._bounds
+		return (left, bottom, right - left, top - bottom)
+
+	def get_max_codepoint(self):
+		"""
+		Returns the highest codepoint of any glyph in the font, or -1.
+		"""
+		if self._maxCodepoint is None:
+			if self.glyphs_by_codepoint:
+				self._maxCodepoint = max(self.glyphs_by_codepoint)
+			else:
+				self._maxCodepoint = -1
+
+		return self._maxCodepoint
+
+	def get_pixel_size(self):
+		"""
+		Returns the height of the font in pixels.
+
+		This is worked out from the point size and vertical resolution, like
+		the PIXEL_SIZE property the writer adds.
+		"""
+		return int(math.ceil(self["RESOLUTION_Y"] * self["POINT_SIZE"] / 72.0))
 
 	def copy(self):
 		"""
-		Returns a deep copy of this font.
+		Returns a copy of this font.
+
+		The copy has copies of our glyphs, which share their bitmap rows with
+		ours (see Glyph.copy()), so changing a glyph in one font doesn't
+		change the other.
 		"""
 
 		# Create a new font object.
@@ -284,13 +1424,133 @@ class Font(object):
 		for p in self.properties:
 			res[p] = self[p]
 
+		# Nothing is ever removed from an arena, so both fonts can keep
+		# their rows in ours.
+		res.arena = self.arena
+
 		# Copy the glyphs across.
-		for g in self.glyphs:
-			res.new_glyph_from_data(g.name, g.get_data(), g.bbX, g.bbY, g.bbW,
-					g.bbH, g.advance, g.codepoint)
+		glyphs = self.glyphs
+		for g in glyphs:
+			res.add_glyph(g.copy())
+
+		# The copies have the same metrics, in the same order.
+		res._bounds = self._bounds
+		res._measuredGlyphs = self._measuredGlyphs
 
 		return res
 
+	def to_array(self, glyphs=None):
+		"""
+		Returns the bitmaps of many glyphs stacked in a 3-D NumPy array.
+
+		glyphs should be some of this font's glyphs, and defaults to all of
+		them. Element [i, y, x] is a pixel of the i'th glyph, 1 if it's set
+		and 0 if not, where y and x count rows and columns of the font
+		bounding box from its top-left corner. So every glyph is drawn at
+		the same origin, and operations on the whole stack apply to every
+		glyph at once. Needs NumPy.
+		"""
+		_need_numpy("Font.to_array()")
+		if glyphs is None:
+			glyphs = self.glyphs
+		left, bottom, width, height = self.get_bounding_box()
+		top = bottom + height
+
+		res = numpy.zeros((len(glyphs), height, width), numpy.uint8)
+
+		# Glyphs with the same bounding box and row type can be unpacked
+		# together.
+		groups = {}
+		for i, g in enumerate(glyphs):
+			if not g.bbW or not g.bbH:
+				continue
+
+			data = g._data
+			if type(data) is ArenaRows:
+				data = data.copy()
+			if isinstance(data, array.array):
+				key = (g.bbX, g.bbY, g.bbW, g.bbH, data.typecode)
+				indices, blocks = groups.setdefault(key, ([], []))
+				indices.append(i)
+				blocks.append(data.tostring())
+			else:
+				# Rows too wide for an array.
+				y = top - g.bbY - g.bbH
+				x = g.bbX - left
+				res[i, y:y + g.bbH, x:x + g.bbW] = g.to_array()
+
+		for (bbX, bbY, bbW, bbH, typecode), (indices, blocks) in \
+				groups.iteritems():
+			rows = numpy.frombuffer("".join(blocks), numpy.dtype(typecode))
+			y = top - bbY - bbH
+			x = bbX - left
+			res[indices, y:y + bbH, x:x + bbW] = _frame_bits(
+					rows.reshape(len(indices), bbH), bbW)
+
+		return res
+
+	def update_from_array(self, pixels, glyphs=None):
+		"""
+		Set the bitmaps of many glyphs from a stack like to_array() returns.
+
+		glyphs should be the glyphs the stack was made from, and defaults to
+		all of them; the font bounding box shouldn't have changed since.
+		Each glyph's bounding box shrinks to fit the pixels set in its layer
+		of the stack, or to nothing at the origin if none are. Needs NumPy.
+		"""
+		_need_numpy("Font.update_from_array()")
+		if glyphs is None:
+			glyphs = self.glyphs
+		left, bottom, width, height = self.get_bounding_box()
+		top = bottom + height
+
+		pixels = numpy.asarray(pixels) != 0
+		if pixels.shape != (len(glyphs), height, width):
+			raise ValueError("Expected a stack of %d glyphs of %dx%d, not %r"
+					% (len(glyphs), width, height, pixels.shape))
+
+		# The first and last rows and columns with pixels set in each glyph,
+		# counting from the top-left.
+		rowsSet = pixels.any(axis=2)
+		columnsSet = pixels.any(axis=1)
+		hasPixels = rowsSet.any(axis=1).tolist()
+		tops = rowsSet.argmax(axis=1).tolist()
+		bottoms = (height - rowsSet[:, ::-1].argmax(axis=1)).tolist()
+		lefts = columnsSet.argmax(axis=1).tolist()
+		rights = (width - columnsSet[:, ::-1].argmax(axis=1)).tolist()
+
+		if width <= 64:
+			# Turn each row of the stack into an integer in one go.
+			shifts = numpy.arange(width - 1, -1, -1, dtype=numpy.uint64)
+			frameRows = (pixels.astype(numpy.uint64) << shifts).sum(axis=2,
+					dtype=numpy.uint64).tolist()
+		else:
+			frameRows = None
+
+		for i, g in enumerate(glyphs):
+			if not hasPixels[i]:
+				g.bbX = g.bbY = g.bbW = g.bbH = 0
+				g.data = []
+				continue
+
+			y0 = tops[i]
+			y1 = bottoms[i]
+			x0 = lefts[i]
+			x1 = rights[i]
+			g.bbX = left + x0
+			g.bbY = top - y1
+			g.bbW = x1 - x0
+			g.bbH = y1 - y0
+
+			if frameRows is not None:
+				shift = width - x1
+				rows = [int(row) >> shift for row in frameRows[i][y0:y1]]
+				rows.reverse()
+				g.data = rows
+			else:
+				g.data = Glyph.from_array(g.name,
+						pixels[i, y0:y1, x0:x1]).data
+
 	def property_names(self):
 		return self.properties.keys()
 
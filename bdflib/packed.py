@@ -0,0 +1,332 @@
+# bdflib, a library for working with BDF font files
+# Copyright (C) 2009, Timothy Alle
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A compact binary font format that can be loaded without parsing.
+
+A packed font file holds a fixed-size header, a table of glyph metrics, an
+index of codepoints sorted so it can be searched in place, the glyph names,
+every glyph bitmap in one block and, last of all, the font properties and
+comments. All numbers are little-endian, and each section starts on a
+four-byte boundary.
+"""
+import binascii
+import marshal
+import mmap
+import struct
+from bdflib import model, util
+
+# The first eight bytes of every packed font.
+PACKED_MAGIC = "BDFLPACK"
+
+# Bump this whenever the layout changes, so old files are rejected rather
+# than misread.
+PACKED_VERSION = 1
+
+# The header: magic, version, glyph count, codepoint index size, the left,
+# bottom, right and top of the font bounding box, the highest codepoint, and
+# the offsets (and sizes, where they can't be worked out) of each section.
+_HEADER = struct.Struct("<8s3I5i8I")
+
+# The metrics for one glyph: codepoint, bounding box, advance, and the
+# offsets of its bitmap and name.
+_METRICS_FORMAT = "6i2I"
+_METRICS = struct.Struct("<" + _METRICS_FORMAT)
+
+
+def _align(size):
+	"""
+	Returns the padding needed to bring size up to a four-byte boundary.
+	"""
+	return "\0" * (-size % 4)
+
+
+def write_packed(font, stream):
+	"""
+	Write the given font object to the given stream as a packed font.
+	"""
+	glyphs = font.glyphs
+	indices = dict((id(g), i) for i, g in enumerate(glyphs))
+
+	metrics = []
+	names = []
+	bitmaps = []
+	nameOffset = 0
+	bitmapOffset = 0
+	for g in glyphs:
+		bitmap = model.pack_bitmap(g._data, g.bbW)
+		metrics.append(_METRICS.pack(g.codepoint, g.bbX, g.bbY, g.bbW,
+				g.bbH, g.advance, bitmapOffset, nameOffset))
+		names.append(g.name + "\0")
+		bitmaps.append(bitmap)
+		nameOffset += len(g.name) + 1
+		bitmapOffset += len(bitmap)
+
+	# The index comes from glyphs_by_codepoint rather than the glyphs, in
+	# case several codepoints share a glyph.
+	index = sorted((codepoint, indices[id(g)])
+			for codepoint, g in font.glyphs_by_codepoint.iteritems())
+
+	sections = [
+			"".join(metrics),
+			struct.pack("<%di" % len(index), *[c for c, i in index]),
+			struct.pack("<%dI" % len(index), *[i for c, i in index]),
+			"".join(names),
+			"".join(bitmaps),
+			marshal.dumps((font.properties, font.comments)),
+		]
+
+	offsets = []
+	offset = _HEADER.size
+	for section in sections:
+		offsets.append(offset)
+		offset += len(section) + len(_align(len(section)))
+
+	left, bottom, width, height = font.get_bounding_box()
+	stream.write(_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, len(glyphs),
+			len(index), left, bottom, left + width, bottom + height,
+			font.get_max_codepoint(), offsets[0], offsets[1], offsets[2],
+			offsets[3], offsets[4], len(sections[4]), offsets[5],
+			len(sections[5])))
+	for section in sections:
+		stream.write(section)
+		stream.write(_align(len(section)))
+
+
+class _PackedGlyph(model.Glyph):
+	"""
+	A glyph whose bitmap is unpacked the first time it's used.
+	"""
+
+	def __init__(self, name, codepoint, bbX, bbY, bbW, bbH, advance, buf,
+			offset):
+		self._owner = None
+		self._source = None
+		self._shared = False
+		self._ink = None
+		self.name = name
+		self.codepoint = codepoint
+		self._bbX = bbX
+		self._bbY = bbY
+		self._bbW = bbW
+		self._bbH = bbH
+		self.advance = advance
+		self._buf = buf
+		self._offset = offset
+		# The glyph may be resized before it's unpacked, so remember the
+		# size of the packed bitmap.
+		self._size = (bbW, bbH)
+
+	def __getattr__(self, attr):
+		# Only called for attributes that haven't been set yet.
+		if attr in ("data", "_data") and "_buf" in self.__dict__:
+			self._load()
+			return getattr(self, attr)
+		raise AttributeError(attr)
+
+	def _load(self):
+		buf = self._buf
+		offset = self._offset
+		width, height = self._size
+		del self._buf
+		del self._offset
+		del self._size
+
+		rowBytes = (width + 7) // 8
+		block = binascii.hexlify(buf[offset:offset + rowBytes * height])
+		rows = model.decode_bitmap(block, height, width)
+		if rows is None:
+			# The bitmap is empty.
+			rows = [0] * height
+		self.data = rows
+
+
+class PackedFont(model.Font):
+	"""
+	A font backed by the contents of a packed font file.
+
+	Looking glyphs up by codepoint searches the file's index, and only
+	unpacks the glyphs asked for. The glyphs and glyphs_by_codepoint
+	attributes are built the first time they're used, after which this
+	behaves like any other font, and can be modified like one.
+	"""
+
+	def __init__(self, buf):
+		if len(buf) < _HEADER.size or buf[:len(PACKED_MAGIC)] != PACKED_MAGIC:
+			raise ValueError("Not a packed font")
+
+		(magic, version, glyphCount, indexCount, left, bottom, right, top,
+				maxCodepoint, self._metricsOffset, self._codepointsOffset,
+				self._indicesOffset, self._namesOffset, self._bitmapsOffset,
+				bitmapsSize, metadataOffset,
+				metadataSize) = _HEADER.unpack_from(buf)
+		if version != PACKED_VERSION:
+			raise ValueError("Unknown packed font version %d" % (version,))
+		if len(buf) < metadataOffset + metadataSize:
+			raise ValueError("Packed font is truncated")
+
+		properties, comments = marshal.loads(
+				buf[metadataOffset:metadataOffset + metadataSize])
+		model.Font.__init__(self, properties["FACE_NAME"],
+				properties["POINT_SIZE"], properties["RESOLUTION_X"],
+				properties["RESOLUTION_Y"])
+		self.properties.update(properties)
+		self.comments = comments
+
+		self._buf = buf
+		self._glyphCount = glyphCount
+		self._indexCount = indexCount
+		self._unpacked = {}
+
+		# The header records everything we'd otherwise have to look at every
+		# glyph for.
+		self._bounds = (left, bottom, right, top)
+		self._measuredGlyphs = glyphCount
+		self._maxCodepoint = maxCodepoint
+
+		# Built by __getattr__ when they're first needed.
+		del self._glyphs
+		del self.glyphs_by_codepoint
+
+	def __getattr__(self, attr):
+		# Only called for attributes that haven't been set yet.
+		if (attr in ("_glyphs", "glyphs_by_codepoint")
+				and "_buf" in self.__dict__):
+			self._unpack_all()
+			return getattr(self, attr)
+		raise AttributeError(attr)
+
+	def __getstate__(self):
+		# The file can't be pickled, so unpack everything it holds.
+		self._unpack_all()
+		state = self.__dict__.copy()
+		del state["_buf"]
+		del state["_unpacked"]
+		return state
+
+	def get_bounding_box(self):
+		# The bounds from the header hold until a glyph that shrinks makes us
+		# start measuring again.
+		if ("_glyphs" not in self.__dict__
+				and self._measuredGlyphs == self._glyphCount):
+			left, bottom, right, top = self._bounds
+			return (left, bottom, right - left, top - bottom)
+		return model.Font.get_bounding_box(self)
+
+	def _glyph(self, index):
+		"""
+		Returns the glyph at the given index, unpacking it if need be.
+		"""
+		glyph = self._unpacked.get(index)
+		if glyph is None:
+			(codepoint, bbX, bbY, bbW, bbH, advance, bitmapOffset,
+					nameOffset) = _METRICS.unpack_from(self._buf,
+					self._metricsOffset + index * _METRICS.size)
+			nameStart = self._namesOffset + nameOffset
+			name = self._buf[nameStart:self._buf.find("\0", nameStart)]
+
+			glyph = _PackedGlyph(name, codepoint, bbX, bbY, bbW, bbH,
+					advance, self._buf, self._bitmapsOffset + bitmapOffset)
+			glyph._owner = self
+			self._unpacked[index] = glyph
+
+		return glyph
+
+	def _find(self, codepoint):
+		"""
+		Returns the index of the glyph for the given codepoint, or None.
+		"""
+		low = 0
+		high = self._indexCount
+		while low < high:
+			middle = (low + high) // 2
+			found, = struct.unpack_from("<i", self._buf,
+					self._codepointsOffset + middle * 4)
+			if found < codepoint:
+				low = middle + 1
+			elif found > codepoint:
+				high = middle
+			else:
+				index, = struct.unpack_from("<I", self._buf,
+						self._indicesOffset + middle * 4)
+				return index
+
+		return None
+
+	def _unpack_all(self):
+		if "_glyphs" in self.__dict__:
+			return
+
+		# Unpack all the metrics and names in one go, rather than a glyph at a
+		# time.
+		buf = self._buf
+		count = self._glyphCount
+		metrics = struct.unpack_from("<" + _METRICS_FORMAT * count, buf,
+				self._metricsOffset)
+		names = buf[self._namesOffset:self._bitmapsOffset].split("\0")
+
+		glyphs = []
+		with util.gc_paused():
+			for index in range(count):
+				glyph = self._unpacked.get(index)
+				if glyph is None:
+					(codepoint, bbX, bbY, bbW, bbH, advance, bitmapOffset,
+							nameOffset) = metrics[index * 8:index * 8 + 8]
+					glyph = _PackedGlyph(names[index], codepoint, bbX, bbY,
+							bbW, bbH, advance, buf,
+							self._bitmapsOffset + bitmapOffset)
+					glyph._owner = self
+				glyphs.append(glyph)
+
+		self.glyphs = glyphs
+
+		count = self._indexCount
+		codepoints = struct.unpack_from("<%di" % count, self._buf,
+				self._codepointsOffset)
+		indices = struct.unpack_from("<%dI" % count, self._buf,
+				self._indicesOffset)
+		self.glyphs_by_codepoint = dict((codepoint, self.glyphs[index])
+				for codepoint, index in zip(codepoints, indices))
+
+	def __getitem__(self, key):
+		if isinstance(key, int) and "_glyphs" not in self.__dict__:
+			index = self._find(key)
+			if index is None:
+				raise KeyError(key)
+			return self._glyph(index)
+		return model.Font.__getitem__(self, key)
+
+	def __contains__(self, key):
+		if isinstance(key, int) and "_glyphs" not in self.__dict__:
+			return self._find(key) is not None
+		return model.Font.__contains__(self, key)
+
+	def codepoints(self):
+		if "_glyphs" not in self.__dict__:
+			return list(struct.unpack_from("<%di" % self._indexCount,
+					self._buf, self._codepointsOffset))
+		return model.Font.codepoints(self)
+
+
+def read_packed(stream):
+	"""
+	Load a packed font from the given file.
+
+	stream should be a real file object, since it will be memory-mapped
+	rather than read. Returns a PackedFont, which unpacks glyphs from the
+	mapping as they're needed.
+	"""
+	return PackedFont(mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ))
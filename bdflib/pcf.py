@@ -0,0 +1,604 @@
+# bdflib, a library for working with BDF font files
+# Copyright (C) 2009, Timothy Alle
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tools to read and write fonts in the X11 Portable Compiled Format (PCF).
+"""
+import array
+import binascii
+import struct
+from bdflib import model, util, writer
+
+# The first four bytes of every PCF file.
+PCF_MAGIC = "\x01fcp"
+
+# Table types.
+PCF_PROPERTIES = 1 << 0
+PCF_ACCELERATORS = 1 << 1
+PCF_METRICS = 1 << 2
+PCF_BITMAPS = 1 << 3
+PCF_INK_METRICS = 1 << 4
+PCF_BDF_ENCODINGS = 1 << 5
+PCF_SWIDTHS = 1 << 6
+PCF_GLYPH_NAMES = 1 << 7
+PCF_BDF_ACCELERATORS = 1 << 8
+
+# Table formats.
+PCF_DEFAULT_FORMAT = 0x00000000
+PCF_INKBOUNDS = 0x00000200
+PCF_ACCEL_W_INKBOUNDS = 0x00000100
+PCF_COMPRESSED_METRICS = 0x00000100
+PCF_FORMAT_MASK = 0xffffff00
+
+# Modifiers to the table formats.
+PCF_GLYPH_PAD_MASK = 3 << 0
+PCF_BYTE_MASK = 1 << 2
+PCF_BIT_MASK = 1 << 3
+PCF_SCAN_UNIT_MASK = 3 << 4
+
+# The glyph index in the encodings table for codepoints without a glyph.
+NO_GLYPH = 0xFFFF
+
+# The highest codepoint a PCF encodings table can hold.
+MAX_CODEPOINT = 0xFFFF
+
+# Translation table that reverses the order of the bits in each byte.
+_REVERSE_BITS = "".join(chr(int("{0:08b}".format(i)[::-1], 2))
+		for i in range(256))
+
+
+def _convert_bitmap_order(blob, format):
+	"""
+	Convert bitmap data between the order format describes and our own.
+
+	Our own order has the most significant bit and byte first, the way BDF
+	hex digits read. The conversion works in either direction.
+	"""
+	if not format & PCF_BIT_MASK:
+		blob = blob.translate(_REVERSE_BITS)
+
+	scanUnit = 1 << ((format & PCF_SCAN_UNIT_MASK) >> 4)
+	if (scanUnit > 1
+			and bool(format & PCF_BYTE_MASK) != bool(format & PCF_BIT_MASK)):
+		for typecode in "HIL":
+			if array.array(typecode).itemsize == scanUnit:
+				break
+		else:
+			raise ValueError("Can't swap bytes in %d-byte units" % scanUnit)
+		units = array.array(typecode, blob)
+		units.byteswap()
+		blob = units.tostring()
+
+	return blob
+
+
+def _row_bytes(width, pad):
+	"""
+	Returns the number of bytes in a bitmap row padded to pad bytes.
+	"""
+	return (width + pad * 8 - 1) // (pad * 8) * pad
+
+
+class _TableReader(object):
+	"""
+	Reads the values in one PCF table, in the byte order of its format.
+	"""
+
+	def __init__(self, data, offset):
+		self.data = data
+		self.format, = struct.unpack_from("<i", data, offset)
+		if self.format & PCF_BYTE_MASK:
+			self.order = ">"
+		else:
+			self.order = "<"
+		self.pos = offset + 4
+
+	def unpack(self, code):
+		code = self.order + code
+		res = struct.unpack_from(code, self.data, self.pos)
+		self.pos += struct.calcsize(code)
+		return res
+
+	def read_strings(self):
+		"""
+		Read a string table, and return a function that looks strings up.
+		"""
+		size, = self.unpack("i")
+		strings = self.data[self.pos:self.pos + size]
+		self.pos += size
+
+		def lookup(offset):
+			return strings[offset:strings.index("\0", offset)]
+
+		return lookup
+
+
+def _read_properties(data, offset):
+	table = _TableReader(data, offset)
+	if table.format & PCF_FORMAT_MASK != PCF_DEFAULT_FORMAT:
+		raise ValueError("Unknown properties format %#x" % table.format)
+
+	count, = table.unpack("i")
+	entries = [table.unpack("ibi") for i in range(count)]
+	# The entries are padded out to a multiple of four bytes.
+	if count & 3:
+		table.pos += 4 - (count & 3)
+	lookup = table.read_strings()
+
+	res = []
+	for nameOffset, isString, value in entries:
+		if isString:
+			value = lookup(value)
+		res.append((lookup(nameOffset), value))
+
+	return res
+
+
+def _read_accelerators(data, offset):
+	"""
+	Returns the font ascent and descent from an accelerators table.
+	"""
+	table = _TableReader(data, offset)
+	table.unpack("8B")
+	fontAscent, fontDescent = table.unpack("ii")
+	return fontAscent, fontDescent
+
+
+def _read_metrics(data, offset):
+	"""
+	Returns a list of (left, right, width, ascent, descent) tuples.
+	"""
+	table = _TableReader(data, offset)
+	tableFormat = table.format & PCF_FORMAT_MASK
+
+	if tableFormat == PCF_COMPRESSED_METRICS:
+		count, = table.unpack("h")
+		values = [value - 0x80 for value in table.unpack("%dB" % (count * 5))]
+		return [tuple(values[i:i + 5]) for i in range(0, len(values), 5)]
+
+	elif tableFormat == PCF_DEFAULT_FORMAT:
+		count, = table.unpack("i")
+		values = table.unpack("hhhhhH" * count)
+		return [values[i:i + 5] for i in range(0, len(values), 6)]
+
+	else:
+		raise ValueError("Unknown metrics format %#x" % table.format)
+
+
+def _read_bitmaps(data, offset):
+	"""
+	Returns the glyph offsets, row padding and bitmap data of a bitmap table.
+
+	The bitmap data is converted to our own bit and byte order.
+	"""
+	table = _TableReader(data, offset)
+	count, = table.unpack("i")
+	offsets = table.unpack("%di" % count)
+	sizes = table.unpack("4i")
+
+	padIndex = table.format & PCF_GLYPH_PAD_MASK
+	blob = data[table.pos:table.pos + sizes[padIndex]]
+
+	return offsets, 1 << padIndex, _convert_bitmap_order(blob, table.format)
+
+
+def _read_encodings(data, offset):
+	"""
+	Returns a list of (codepoint, glyph index) pairs.
+	"""
+	table = _TableReader(data, offset)
+	firstCol, lastCol, firstRow, lastRow, defaultChar = table.unpack("4hH")
+	cols = lastCol - firstCol + 1
+	rows = lastRow - firstRow + 1
+	indices = table.unpack("%dH" % (cols * rows))
+
+	res = []
+	for i, index in enumerate(indices):
+		if index != NO_GLYPH:
+			row, col = divmod(i, cols)
+			res.append((((firstRow + row) << 8) | (firstCol + col), index))
+
+	return res
+
+
+def _read_glyph_names(data, offset):
+	table = _TableReader(data, offset)
+	count, = table.unpack("i")
+	offsets = table.unpack("%di" % count)
+	lookup = table.read_strings()
+
+	return [lookup(offset) for offset in offsets]
+
+
+def read_pcf(stream):
+	"""
+	Read a PCF-format font from the given stream.
+
+	Any bitmap padding, bit order and byte order is accepted. Tables that the
+	font model has no use for, such as the ink metrics, are skipped.
+	"""
+	data = stream.read()
+	if data[:4] != PCF_MAGIC:
+		raise ValueError("Not a PCF font")
+
+	tableCount, = struct.unpack_from("<i", data, 4)
+	tables = {}
+	for i in range(tableCount):
+		tableType, tableFormat, size, offset = struct.unpack_from("<iiii",
+				data, 8 + 16 * i)
+		tables[tableType] = offset
+
+	for tableType in (PCF_PROPERTIES, PCF_METRICS, PCF_BITMAPS):
+		if tableType not in tables:
+			raise ValueError("PCF font has no table of type %d"
+					% (tableType,))
+
+	properties = _read_properties(data, tables[PCF_PROPERTIES])
+	values = dict(properties)
+	font = model.Font(values.get("FONT", ""),
+			values.get("POINT_SIZE", 0) / 10.0,
+			values.get("RESOLUTION_X", 0), values.get("RESOLUTION_Y", 0))
+	for key, value in properties:
+		if key != "FONT":
+			font[key] = value
+
+	# Older fonts might only record the ascent and descent in their
+	# accelerator tables.
+	for tableType in (PCF_BDF_ACCELERATORS, PCF_ACCELERATORS):
+		if tableType in tables:
+			ascent, descent = _read_accelerators(data, tables[tableType])
+			if "FONT_ASCENT" not in font:
+				font["FONT_ASCENT"] = ascent
+			if "FONT_DESCENT" not in font:
+				font["FONT_DESCENT"] = descent
+			break
+
+	metrics = _read_metrics(data, tables[PCF_METRICS])
+	offsets, pad, blob = _read_bitmaps(data, tables[PCF_BITMAPS])
+	if len(offsets) != len(metrics):
+		raise ValueError("PCF font has %d bitmaps for %d glyphs"
+				% (len(offsets), len(metrics)))
+
+	if PCF_GLYPH_NAMES in tables:
+		names = _read_glyph_names(data, tables[PCF_GLYPH_NAMES])
+	else:
+		names = None
+
+	# Work out the codepoint of each glyph. If several codepoints share a
+	# glyph, the extras get copies of it.
+	codepoints = [-1] * len(metrics)
+	aliases = []
+	if PCF_BDF_ENCODINGS in tables:
+		for codepoint, index in _read_encodings(data,
+				tables[PCF_BDF_ENCODINGS]):
+			if index >= len(metrics):
+				raise ValueError("Codepoint %d maps to missing glyph %d"
+						% (codepoint, index))
+			if codepoints[index] == -1:
+				codepoints[index] = codepoint
+			else:
+				aliases.append((codepoint, index))
+
+	glyphs = []
+	with util.gc_paused():
+		for index, (left, right, advance, ascent, descent) in enumerate(
+				metrics):
+			bbW = right - left
+			bbH = ascent + descent
+			rowBytes = _row_bytes(bbW, pad)
+			start = offsets[index]
+
+			if bbH <= 0:
+				data = []
+			elif rowBytes == 0:
+				data = [0] * bbH
+			else:
+				data = model.decode_bitmap(binascii.hexlify(
+						blob[start:start + rowBytes * bbH]), bbH, bbW)
+				if data is None:
+					raise ValueError("Glyph %d has a bad bitmap" % (index,))
+
+			if names is not None:
+				name = names[index]
+			elif codepoints[index] >= 0:
+				name = "char%d" % (codepoints[index],)
+			else:
+				name = "glyph%d" % (index,)
+
+			glyph = model.Glyph(name, None, left, -descent, bbW, bbH,
+					advance, codepoints[index])
+			glyph.data = data
+			glyphs.append(glyph)
+			font.add_glyph(glyph)
+
+		for codepoint, index in aliases:
+			original = glyphs[index]
+			glyph = model.Glyph(original.name, None, original.bbX,
+					original.bbY, original.bbW, original.bbH,
+					original.advance, codepoint)
+			glyph.data = list(original.data)
+			font.add_glyph(glyph)
+
+	return font
+
+
+class _TableWriter(object):
+	"""
+	Builds one PCF table, in the byte order of its format.
+	"""
+
+	def __init__(self, tableType, format):
+		self.type = tableType
+		self.format = format
+		if format & PCF_BYTE_MASK:
+			self.order = ">"
+		else:
+			self.order = "<"
+		self.parts = [struct.pack("<i", format)]
+
+	def pack(self, code, *values):
+		self.parts.append(struct.pack(self.order + code, *values))
+
+	def write(self, data):
+		self.parts.append(data)
+
+	def write_strings(self, strings):
+		"""
+		Write a string table, and return the offset of each string in it.
+		"""
+		offsets = []
+		size = 0
+		for s in strings:
+			offsets.append(size)
+			size += len(s) + 1
+
+		self.pack("i", size)
+		self.write("".join(s + "\0" for s in strings))
+
+		return offsets
+
+	def getvalue(self):
+		res = "".join(self.parts)
+		# Each table starts on a four-byte boundary.
+		return res + "\0" * (-len(res) % 4)
+
+
+def _properties_table(properties, modifiers):
+	table = _TableWriter(PCF_PROPERTIES, PCF_DEFAULT_FORMAT | modifiers)
+
+	keys = sorted(properties.keys())
+	strings = []
+	for key in keys:
+		strings.append(key)
+		value = properties[key]
+		if not (isinstance(value, (int, long))
+				and -2**31 <= value < 2**31):
+			strings.append(str(value))
+
+	table.pack("i", len(keys))
+	# The string table comes after the entries, but the entries need the
+	# offsets of the strings, so build it separately.
+	stringTable = _TableWriter(0, modifiers)
+	offsets = iter(stringTable.write_strings(strings))
+	for key in keys:
+		value = properties[key]
+		nameOffset = offsets.next()
+		if isinstance(value, (int, long)) and -2**31 <= value < 2**31:
+			table.pack("ibi", nameOffset, 0, value)
+		else:
+			table.pack("ibi", nameOffset, 1, offsets.next())
+	# The entries are padded out to a multiple of four bytes.
+	if len(keys) & 3:
+		table.write("\0" * (4 - (len(keys) & 3)))
+	table.parts.extend(stringTable.parts[1:])
+
+	return table
+
+
+def _metrics_table(metrics, modifiers):
+	values = [value for metric in metrics for value in metric]
+
+	if (len(metrics) < 2**15 and all(-0x80 <= value < 0x80
+			for value in values)):
+		table = _TableWriter(PCF_METRICS, PCF_COMPRESSED_METRICS | modifiers)
+		table.pack("h", len(metrics))
+		table.pack("%dB" % len(values), *[value + 0x80 for value in values])
+	else:
+		table = _TableWriter(PCF_METRICS, PCF_DEFAULT_FORMAT | modifiers)
+		table.pack("i", len(metrics))
+		for metric in metrics:
+			table.pack("hhhhhH", *(metric + (0,)))
+
+	return table
+
+
+def _accelerators_table(tableType, metrics, fontAscent, fontDescent,
+		modifiers):
+	if metrics:
+		columns = zip(*metrics)
+		minBounds = tuple(min(column) for column in columns)
+		maxBounds = tuple(max(column) for column in columns)
+		maxOverlap = max(right - advance
+				for left, right, advance, ascent, descent in metrics)
+	else:
+		minBounds = maxBounds = (0, 0, 0, 0, 0)
+		maxOverlap = 0
+
+	minLeft, minRight, minAdvance, minAscent, minDescent = minBounds
+	maxLeft, maxRight, maxAdvance, maxAscent, maxDescent = maxBounds
+
+	noOverlap = maxOverlap <= minLeft
+	constantMetrics = minBounds == maxBounds
+	terminalFont = (constantMetrics and maxLeft == 0
+			and maxRight == maxAdvance and maxAscent == fontAscent
+			and maxDescent == fontDescent)
+	constantWidth = minAdvance == maxAdvance
+	inkInside = (minLeft >= 0 and maxOverlap <= 0
+			and maxAscent <= fontAscent and maxDescent <= fontDescent)
+
+	table = _TableWriter(tableType, PCF_DEFAULT_FORMAT | modifiers)
+	# The last two flags are inkMetrics and drawDirection, followed by a byte
+	# of padding.
+	table.pack("8B", noOverlap, constantMetrics, terminalFont, constantWidth,
+			inkInside, 0, 0, 0)
+	table.pack("iii", fontAscent, fontDescent, maxOverlap)
+	table.pack("hhhhhH", *(minBounds + (0,)))
+	table.pack("hhhhhH", *(maxBounds + (0,)))
+
+	return table
+
+
+def _bitmaps_table(glyphs, pad, modifiers):
+	table = _TableWriter(PCF_BITMAPS, PCF_DEFAULT_FORMAT | modifiers)
+
+	offsets = []
+	parts = []
+	size = 0
+	for g in glyphs:
+		offsets.append(size)
+		part = model.pack_bitmap(g._data, g.bbW, _row_bytes(g.bbW, pad))
+		parts.append(part)
+		size += len(part)
+
+	# The table records how big the bitmaps would be with each kind of
+	# padding.
+	sizes = [sum(_row_bytes(g.bbW, 1 << i) * g.bbH for g in glyphs)
+			for i in range(4)]
+
+	table.pack("i", len(glyphs))
+	table.pack("%di" % len(glyphs), *offsets)
+	table.pack("4i", *sizes)
+	table.write(_convert_bitmap_order("".join(parts), table.format))
+
+	return table
+
+
+def _encodings_table(glyphs, defaultChar, modifiers):
+	table = _TableWriter(PCF_BDF_ENCODINGS, PCF_DEFAULT_FORMAT | modifiers)
+
+	encoded = [(g.codepoint, index) for index, g in enumerate(glyphs)
+			if 0 <= g.codepoint <= MAX_CODEPOINT]
+	if encoded:
+		cols = [codepoint & 0xFF for codepoint, index in encoded]
+		rows = [codepoint >> 8 for codepoint, index in encoded]
+		firstCol, lastCol = min(cols), max(cols)
+		firstRow, lastRow = min(rows), max(rows)
+	else:
+		firstCol = lastCol = firstRow = lastRow = 0
+
+	width = lastCol - firstCol + 1
+	indices = [NO_GLYPH] * (width * (lastRow - firstRow + 1))
+	for codepoint, index in encoded:
+		indices[((codepoint >> 8) - firstRow) * width
+				+ (codepoint & 0xFF) - firstCol] = index
+
+	if not (isinstance(defaultChar, (int, long))
+			and 0 <= defaultChar <= MAX_CODEPOINT):
+		defaultChar = NO_GLYPH
+
+	table.pack("4hH", firstCol, lastCol, firstRow, lastRow, defaultChar)
+	table.pack("%dH" % len(indices), *indices)
+
+	return table
+
+
+def _swidths_table(glyphs, pixelSize, modifiers):
+	table = _TableWriter(PCF_SWIDTHS, PCF_DEFAULT_FORMAT | modifiers)
+	table.pack("i", len(glyphs))
+	table.pack("%di" % len(glyphs),
+			*[int(1000.0 * g.advance / pixelSize) for g in glyphs])
+	return table
+
+
+def _glyph_names_table(glyphs, modifiers):
+	table = _TableWriter(PCF_GLYPH_NAMES, PCF_DEFAULT_FORMAT | modifiers)
+	table.pack("i", len(glyphs))
+	stringTable = _TableWriter(0, modifiers)
+	offsets = stringTable.write_strings([g.name for g in glyphs])
+	table.pack("%di" % len(glyphs), *offsets)
+	table.parts.extend(stringTable.parts[1:])
+	return table
+
+
+def write_pcf(font, stream, glyph_pad=4, scan_unit=1, msb_bit_first=True,
+		msb_byte_first=True):
+	"""
+	Write the given font object to the given stream as a PCF font.
+
+	glyph_pad is the number of bytes each bitmap row is padded out to (1, 2,
+	4 or 8). msb_bit_first says whether the leftmost pixel of each byte is
+	its most significant bit, and msb_byte_first whether the most
+	significant byte comes first in each scan_unit bytes of bitmap (1, 2 or
+	4) and in the other numbers in the file. These match the -p, -u, -m/-l
+	and -M/-L options of bdftopcf.
+
+	The properties are the same ones write_bdf() would write. PCF can't
+	record codepoints above 0xFFFF, so glyphs with those are written without
+	a codepoint.
+	"""
+	padIndex = {1: 0, 2: 1, 4: 2, 8: 3}.get(glyph_pad)
+	unitIndex = {1: 0, 2: 1, 4: 2}.get(scan_unit)
+	if padIndex is None:
+		raise ValueError("glyph_pad must be 1, 2, 4 or 8, not %r"
+				% (glyph_pad,))
+	if unitIndex is None or scan_unit > glyph_pad:
+		raise ValueError("scan_unit must be 1, 2 or 4, and no more than "
+				"glyph_pad, not %r" % (scan_unit,))
+
+	glyphs = font.glyphs
+	if len(glyphs) >= NO_GLYPH:
+		raise ValueError("PCF fonts can't hold more than %d glyphs"
+				% (NO_GLYPH - 1,))
+
+	modifiers = padIndex | unitIndex << 4
+	if msb_byte_first:
+		modifiers |= PCF_BYTE_MASK
+	if msb_bit_first:
+		modifiers |= PCF_BIT_MASK
+
+	properties = writer.font_properties(font)
+	properties["FONT"] = font["FACE_NAME"]
+
+	metrics = [(g.bbX, g.bbX + g.bbW, g.advance, g.bbY + g.bbH, -g.bbY)
+			for g in glyphs]
+
+	tables = [
+			_properties_table(properties, modifiers),
+			_accelerators_table(PCF_ACCELERATORS, metrics,
+				properties["FONT_ASCENT"], properties["FONT_DESCENT"],
+				modifiers),
+			_metrics_table(metrics, modifiers),
+			_bitmaps_table(glyphs, glyph_pad, modifiers),
+			_encodings_table(glyphs, properties.get("DEFAULT_CHAR"),
+				modifiers),
+			_swidths_table(glyphs, properties["PIXEL_SIZE"], modifiers),
+			_glyph_names_table(glyphs, modifiers),
+			_accelerators_table(PCF_BDF_ACCELERATORS, metrics,
+				properties["FONT_ASCENT"], properties["FONT_DESCENT"],
+				modifiers),
+		]
+
+	contents = [table.getvalue() for table in tables]
+
+	header = [PCF_MAGIC, struct.pack("<i", len(tables))]
+	offset = 8 + 16 * len(tables)
+	for table, content in zip(tables, contents):
+		header.append(struct.pack("<iiii", table.type, table.format,
+				len(content), offset))
+		offset += len(content)
+
+	stream.write("".join(header))
+	stream.writelines(contents)
@@ -0,0 +1,170 @@
+# bdflib, a library for working with BDF font files
+# Copyright (C) 2009, Timothy Alle
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tools to read and write fonts in the Linux console's PSF2 format.
+
+Every glyph in a PSF2 font is a bitmap of the same size, so fonts are
+written with cells the size of the font bounding box.
+"""
+import binascii
+import struct
+from bdflib import model, util
+
+# The first four bytes of every PSF2 file.
+PSF2_MAGIC = "\x72\xb5\x4a\x86"
+
+# The header flag that says the font has a Unicode table.
+PSF2_HAS_UNICODE_TABLE = 0x01
+
+# Bytes in the Unicode table that start a sequence of codepoints, and end
+# the entry for a glyph.
+PSF2_STARTSEQ = "\xfe"
+PSF2_SEPARATOR = "\xff"
+
+# The layout of the header: magic, version, header size, flags, glyph
+# count, bytes per glyph, height and width.
+_HEADER = struct.Struct("<4s7I")
+
+
+def _encode_codepoint(codepoint):
+	return ("\\U%08x" % codepoint).decode("unicode-escape").encode("utf-8")
+
+
+def _decode_codepoints(text):
+	"""
+	Returns the codepoints of the UTF-8 characters in text.
+	"""
+	res = []
+	for char in text.decode("utf-8"):
+		codepoint = ord(char)
+		# Narrow Python builds split characters outside the BMP in two.
+		if res and 0xDC00 <= codepoint <= 0xDFFF \
+				and 0xD800 <= res[-1] <= 0xDBFF:
+			codepoint = 0x10000 + ((res.pop() - 0xD800) << 10) \
+					+ (codepoint - 0xDC00)
+		res.append(codepoint)
+	return res
+
+
+def write_psf(font, stream):
+	"""
+	Write the given font object to the given stream as a PSF2 font.
+
+	Each glyph is placed in a cell the size of the font bounding box, at the
+	same position relative to the font's origin. The Unicode table maps each
+	glyph to the codepoints it has in the font.
+	"""
+	glyphs = font.glyphs
+	fontX, fontY, width, height = font.get_bounding_box()
+	rowBytes = (width + 7) // 8
+	cellBits = rowBytes * 8
+
+	# The cells go bottom row of the last glyph first, so that packing them
+	# like one tall bitmap puts them in order, top row first.
+	rows = []
+	for g in reversed(glyphs):
+		# Rows of the cell above and below the glyph are blank.
+		above = fontY + height - g.bbY - g.bbH
+		below = g.bbY - fontY
+		shift = cellBits - (g.bbX - fontX) - g.bbW
+		mask = (1 << g.bbW) - 1
+
+		rows.extend([0] * below)
+		rows.extend((row & mask) << shift for row in g._data)
+		rows.extend([0] * above)
+
+	# Several codepoints might share a glyph, so invert the codepoint map
+	# rather than asking each glyph for its codepoint.
+	codepoints = {}
+	for codepoint, g in font.glyphs_by_codepoint.iteritems():
+		codepoints.setdefault(id(g), []).append(codepoint)
+
+	table = []
+	for g in glyphs:
+		for codepoint in sorted(codepoints.get(id(g), [])):
+			table.append(_encode_codepoint(codepoint))
+		table.append(PSF2_SEPARATOR)
+
+	stream.write(_HEADER.pack(PSF2_MAGIC, 0, _HEADER.size,
+			PSF2_HAS_UNICODE_TABLE, len(glyphs), rowBytes * height, height,
+			width))
+	stream.write(model.pack_bitmap(rows, cellBits))
+	stream.write("".join(table))
+
+
+def read_psf(stream, name="", descent=0):
+	"""
+	Read a PSF2-format font from the given stream.
+
+	PSF2 fonts don't record a name or a baseline, so the font gets the given
+	name, and the bottom descent rows of each cell hang below the baseline.
+	Glyphs without an entry in the Unicode table are not encoded. Glyphs for
+	more than one codepoint are copied for each extra codepoint, and
+	sequences of codepoints are ignored.
+	"""
+	data = stream.read()
+	if len(data) < _HEADER.size or not data.startswith(PSF2_MAGIC):
+		raise ValueError("Not a PSF2 font")
+
+	(magic, version, headerSize, flags, glyphCount, charSize, height,
+			width) = _HEADER.unpack_from(data)
+	rowBytes = (width + 7) // 8
+	if charSize != rowBytes * height:
+		raise ValueError("PSF2 glyphs of %d bytes can't be %dx%d"
+				% (charSize, width, height))
+
+	bitmapEnd = headerSize + glyphCount * charSize
+	if len(data) < bitmapEnd:
+		raise ValueError("PSF2 font is truncated")
+	bitmaps = data[headerSize:bitmapEnd]
+
+	if flags & PSF2_HAS_UNICODE_TABLE:
+		entries = data[bitmapEnd:].split(PSF2_SEPARATOR)[:glyphCount]
+		codepoints = [_decode_codepoints(entry.split(PSF2_STARTSEQ)[0])
+				for entry in entries]
+	else:
+		codepoints = []
+	codepoints.extend([] for i in range(glyphCount - len(codepoints)))
+
+	# A PSF font has the same pixel size as its height.
+	font = model.Font(name, height, 72, 72)
+	font["FONT_ASCENT"] = height - descent
+	font["FONT_DESCENT"] = descent
+
+	with util.gc_paused():
+		for index in range(glyphCount):
+			cell = bitmaps[index * charSize:(index + 1) * charSize]
+			if height:
+				rows = model.decode_bitmap(binascii.hexlify(cell), height,
+						width) if width else [0] * height
+			else:
+				rows = []
+
+			for codepoint in codepoints[index] or [-1]:
+				if codepoint in font.glyphs_by_codepoint:
+					# Only the first glyph for each codepoint counts.
+					continue
+				if codepoint >= 0:
+					glyphName = "char%d" % (codepoint,)
+				else:
+					glyphName = "glyph%d" % (index,)
+				glyph = model.Glyph(glyphName, None, 0, -descent, width,
+						height, width, codepoint)
+				glyph.data = list(rows)
+				font.add_glyph(glyph)
+
+	return font
@@ -17,9 +17,20 @@
 """
 Code to build font and glyph objects from a BDF font.
 """
-from bdflib import model
+import marshal
+import mmap
+import multiprocessing
+import re
+from bdflib import model, util
 
-def _read_glyph(iterable, font):
+def _parse_glyph(iterable, wanted=None):
+	"""
+	Parse the next glyph definition from iterable.
+
+	Returns the arguments for building a glyph object. If wanted is given and
+	returns false for the glyph's codepoint, the bitmap is skipped without
+	being decoded and None is returned instead.
+	"""
 	glyphName = ""
 	codepoint = -1
 	bbX = 0
@@ -43,13 +54,45 @@ def _read_glyph(iterable, font):
 		elif key == "BBX":
 			bbW, bbH, bbX, bbY = [int(val) for val in values]
 		elif key == "BITMAP":
+			if wanted is not None and not wanted(codepoint):
+				for i in range(bbH):
+					iterable.next()
+				assert iterable.next().strip() == "ENDCHAR"
+				return None
+
 			# The next bbH lines describe the font bitmap.
 			data = [iterable.next().strip() for i in range(bbH)]
 			assert iterable.next().strip() == "ENDCHAR"
 			break
 
-	font.new_glyph_from_data(glyphName, data, bbX, bbY, bbW, bbH, advance,
-			codepoint)
+	return (glyphName, data, bbX, bbY, bbW, bbH, advance, codepoint)
+
+
+def _codepoint_filter(codepoints):
+	"""
+	Returns a function that says whether a codepoint was asked for.
+
+	codepoints may be None (meaning every codepoint), a function that takes a
+	codepoint and returns true if it is wanted, or a container of the wanted
+	codepoints.
+	"""
+	if codepoints is None or callable(codepoints):
+		return codepoints
+	return codepoints.__contains__
+
+
+# Finds the ENCODING line in a glyph definition.
+_ENCODING = re.compile(r"^[ \t]*ENCODING[ \t]+(-?\d+)", re.M)
+
+
+def _record_codepoint(record):
+	"""
+	Returns the codepoint of a glyph definition, without parsing the rest.
+	"""
+	match = _ENCODING.search(record)
+	if match is None:
+		return -1
+	return int(match.group(1))
 
 
 def _unquote_property_value(value):
@@ -68,13 +111,17 @@ def _read_property(iterable, font):
 	font[key] = _unquote_property_value(value)
 
 
-def read_bdf(iterable):
+def read_bdf_header(iterable):
 	"""
-	Read a BDF-format font from the given source.
+	Read the BDF header from the given source, up to and including CHARS.
 
-	iterable should be an iterable that yields a string for each line of the
-	BDF file - for example, a list of strings, or a file-like object.
+	iterable is the same as for read_bdf(), but nothing after the CHARS line
+	is read from it, so this is a cheap way to find out about a font without
+	parsing its glyphs. Returns a tuple of a font object with the header,
+	properties and comments of the BDF file but no glyphs, and the number of
+	glyphs that follow.
 	"""
+	iterable = iter(iterable)
 	name = ""
 	pointSize = 0.0
 	resX = 0
@@ -108,10 +155,570 @@ def read_bdf(iterable):
 
 			assert iterable.next().strip() == "ENDPROPERTIES"
 		elif key == "CHARS":
-			glyphCount = int(values[0])
-			[_read_glyph(iterable, font) for i in range(glyphCount)]
-			break
+			return font, int(values[0])
+
+	raise ValueError("BDF font has no CHARS section")
+
+
+def read_bdf(iterable, workers=None, codepoints=None, keep_source=False):
+	"""
+	Read a BDF-format font from the given source.
+
+	iterable should be an iterable that yields a string for each line of the
+	BDF file - for example, a list of strings, or a file-like object.
+
+	If workers is more than 1, the glyphs are parsed in that many worker
+	processes. The resulting font is the same either way. It's ignored if
+	keep_source is true, since the whole file is then parsed in one go.
+
+	If codepoints is given, only the glyphs it selects are added to the font;
+	the bitmaps of the others are skipped without being decoded. It may be a
+	container of codepoints, such as a set, or a function that takes a
+	codepoint and returns true if that glyph is wanted. Unencoded glyphs have
+	the codepoint -1.
+
+	If keep_source is true, each glyph remembers the text it was read from,
+	and writer.write_bdf() copies that text straight out for glyphs that
+	haven't been modified since (see Glyph.set_source()). The glyphs are
+	then parsed from the whole file at once, like read_bdf_bytes().
+	"""
+	if keep_source:
+		return read_bdf_bytes(_join_lines(iterable), codepoints, True)
+	if workers is not None and workers > 1:
+		return _read_bdf_parallel(iterable, workers, codepoints)
+
+	items = iter_bdf(iterable, codepoints)
+	font = items.next()
+	for glyph in items:
+		font.add_glyph(glyph)
+
+	return font
+
+
+def _join_lines(iterable):
+	"""
+	Returns the lines from iterable joined into one string.
+
+	The lines may or may not have line endings, as long as they all agree.
+	"""
+	lines = list(iterable)
+	if lines and lines[0].endswith("\n"):
+		return "".join(lines)
+	else:
+		return "\n".join(lines)
+
+
+def _read_bdf_parallel(iterable, workers, codepoints=None):
+	"""
+	Read a BDF-format font, parsing the glyphs in a pool of processes.
+	"""
+	iterable = iter(iterable)
+	font, glyphCount = read_bdf_header(iterable)
+
+	# Gather up the rest of the font, and split it into glyph definitions.
+	rest = _join_lines(iterable)
+	records = ("\n" + rest).split("\nENDCHAR")
+	if len(records) != glyphCount + 1:
+		raise ValueError("Expected %d glyphs, found %d"
+				% (glyphCount, len(records) - 1))
+	glyphRecords = _select_records(records[:glyphCount], codepoints)
+
+	# Give each worker a few chunks of contiguous glyphs, so that one slow
+	# chunk doesn't hold the others up.
+	chunkSize = len(glyphRecords) // (workers * 4) + 1
+	chunks = [glyphRecords[i:i + chunkSize]
+			for i in range(0, len(glyphRecords), chunkSize)]
+
+	pool = multiprocessing.Pool(workers)
+	try:
+		# imap() hands back the chunks in the order we gave them, so the
+		# glyphs are added in file order.
+		with util.gc_paused():
+			for chunk in pool.imap(_parse_glyph_chunk, chunks):
+				for (name, data, bbX, bbY, bbW, bbH, advance, codepoint
+						) in marshal.loads(chunk):
+					glyph = model.Glyph(name, None, bbX, bbY, bbW, bbH,
+							advance, codepoint)
+					glyph.data = data
+					font.add_glyph(glyph)
+	finally:
+		pool.terminate()
+		pool.join()
+
+	assert records[-1].split(None, 1)[0] == "ENDFONT"
+
+	return font
+
+
+def _parse_glyph_chunk(records):
+	"""
+	Parse some glyph definitions in a worker process.
+
+	Returns the arguments for building each glyph, marshalled into a string.
+	That's much cheaper for the parent process to unpack than pickled glyph
+	objects, and the parent's share of the work is what limits how well this
+	scales.
+	"""
+	return marshal.dumps([(g.name, list(g.data), g.bbX, g.bbY, g.bbW,
+			g.bbH, g.advance, g.codepoint)
+			for g in _parse_glyph_records(records)])
+
+
+def font_to_tuple(font):
+	"""
+	Returns a compact representation of font, made of marshallable types.
+	"""
+	pixelSize = font.get_pixel_size()
+	return (
+			font.properties,
+			font.comments,
+			[(g.name, list(g._data), g.bbX, g.bbY, g.bbW, g.bbH, g.advance,
+				g.codepoint, g.get_source(pixelSize)) for g in font.glyphs],
+		)
+
+
+def font_from_tuple(data):
+	"""
+	Rebuilds a font object from the output of font_to_tuple().
+	"""
+	properties, comments, glyphs = data
+
+	font = model.Font(properties["FACE_NAME"], properties["POINT_SIZE"],
+			properties["RESOLUTION_X"], properties["RESOLUTION_Y"])
+	font.properties.update(properties)
+	font.comments.extend(comments)
+	pixelSize = font.get_pixel_size()
+
+	with util.gc_paused():
+		for (name, data, bbX, bbY, bbW, bbH, advance, codepoint, source
+				) in glyphs:
+			glyph = model.Glyph(name, None, bbX, bbY, bbW, bbH, advance,
+					codepoint)
+			glyph.data = data
+			if source is not None:
+				glyph.set_source(source, pixelSize)
+			font.add_glyph(glyph)
+
+	return font
+
+
+def read_many(paths, executor=None):
+	"""
+	Read many BDF fonts concurrently.
+
+	paths is a sequence of filenames, which may be compressed (see
+	util.open_font()). Each file is read and parsed by executor, which may be
+	a multiprocessing.Pool, a multiprocessing.pool.ThreadPool or anything
+	else with an imap_unordered() method. By default a process pool with one
+	worker per CPU is used, and shut down afterwards.
+
+	Yields a (path, font, error) tuple for each file as soon as it has been
+	read, so the fonts don't come back in any particular order. If a file
+	can't be read, font is None and error is the exception that was raised;
+	otherwise error is None. One bad file doesn't stop the rest.
+	"""
+	if executor is None:
+		pool = multiprocessing.Pool()
+	else:
+		pool = executor
+
+	try:
+		for path, data, error in pool.imap_unordered(_read_one, paths):
+			if error is None:
+				yield path, font_from_tuple(marshal.loads(data)), None
+			else:
+				yield path, None, error
+	finally:
+		if executor is None:
+			pool.terminate()
+			pool.join()
+
+
+def _read_one(path):
+	"""
+	Read the font in path for read_many().
+
+	Returns a tuple of path, the font marshalled by font_to_tuple() and None,
+	or path, None and the exception that stopped us.
+	"""
+	try:
+		with util.open_font(path) as stream:
+			font = read_bdf_bytes(stream.read())
+		return path, marshal.dumps(font_to_tuple(font)), None
+	except Exception as e:
+		return path, None, e
+
+
+def iter_bdf(iterable, codepoints=None):
+	"""
+	Read a BDF-format font from the given source, one glyph at a time.
+
+	iterable and codepoints are the same as for read_bdf(). The first item
+	yielded is a font object with the header, properties and comments of the
+	BDF file but no glyphs. Each following item is a glyph object, in file
+	order. The glyphs are not added to the font, so only one needs to be in
+	memory at a time.
+	"""
+	wanted = _codepoint_filter(codepoints)
+	iterable = iter(iterable)
+	font, glyphCount = read_bdf_header(iterable)
+	yield font
+
+	for i in range(glyphCount):
+		args = _parse_glyph(iterable, wanted)
+		if args is not None:
+			yield model.Glyph(*args)
 
 	assert iterable.next().strip() == "ENDFONT"
 
+
+def _iter_lines(buf, pos):
+	"""
+	Yield the lines of buf, starting at offset pos, without line endings.
+	"""
+	size = len(buf)
+	while pos < size:
+		end = buf.find("\n", pos)
+		if end < 0:
+			end = size
+		yield buf[pos:end]
+		pos = end + 1
+
+
+def _split_header(buf):
+	"""
+	Read the BDF header from the start of buf.
+
+	Returns a tuple of a font object with no glyphs, the number of glyphs
+	that follow, and the offset of the end of the CHARS line.
+	"""
+	charsStart = buf.find("\nCHARS ")
+	if charsStart < 0:
+		raise ValueError("BDF font has no CHARS section")
+	headerEnd = buf.find("\n", charsStart + 1)
+	if headerEnd < 0:
+		headerEnd = len(buf)
+
+	font, glyphCount = read_bdf_header(iter(buf[:headerEnd].splitlines()))
+
+	return font, glyphCount, headerEnd
+
+
+def _index_glyphs(buf, pos, glyphCount):
+	"""
+	Find each of the next glyphCount glyphs in buf, starting at offset pos.
+
+	Returns a list of (offset, name, codepoint) tuples, where offset is the
+	position of the glyph's STARTCHAR line. Nothing but the STARTCHAR and
+	ENCODING lines is parsed.
+	"""
+	res = []
+	for i in range(glyphCount):
+		start = buf.find("\nSTARTCHAR", pos) + 1
+		assert start > 0, "Expected %d glyphs, found %d" % (glyphCount, i)
+		nameEnd = buf.find("\n", start)
+		name = " ".join(buf[start:nameEnd].strip().split(' ')[1:])
+
+		pos = buf.find("\nENDCHAR", nameEnd)
+		assert pos >= 0, "Glyph %r has no ENDCHAR" % (name,)
+
+		encoding = buf.find("\nENCODING", nameEnd, pos)
+		if encoding >= 0:
+			encodingEnd = buf.find("\n", encoding + 1)
+			codepoint = int(buf[encoding:encodingEnd].split()[1])
+		else:
+			codepoint = -1
+
+		res.append((start, name, codepoint))
+
+	return res
+
+
+# The glyph attributes that aren't known until a lazy glyph is parsed.
+_LAZY_ATTRIBUTES = frozenset(["data", "_data", "bbX", "bbY", "bbW", "bbH",
+		"_bbX", "_bbY", "_bbW", "_bbH", "advance"])
+
+# The slots _LazyGlyph._load() fills in, unless they've already been set.
+_LAZY_SLOTS = ("_data", "_bbX", "_bbY", "_bbW", "_bbH", "advance")
+
+
+class _LazyGlyph(model.Glyph):
+	"""
+	A glyph whose metrics and bitmap are parsed the first time they're used.
+	"""
+
+	def __init__(self, name, codepoint, buf, offset):
+		self._owner = None
+		self._source = None
+		self._shared = False
+		self._ink = None
+		self.name = name
+		self.codepoint = codepoint
+		self._buf = buf
+		self._offset = offset
+
+	def __getattr__(self, attr):
+		# Only called for attributes that haven't been set yet.
+		if attr in _LAZY_ATTRIBUTES and "_buf" in self.__dict__:
+			self._load()
+			return getattr(self, attr)
+		raise AttributeError(attr)
+
+	def _load(self):
+		parsed = model.Glyph(*_parse_glyph(
+				_iter_lines(self._buf, self._offset)))
+		del self._buf
+		del self._offset
+
+		# The name and codepoint came from the index, and anything else set
+		# before the glyph was parsed should win over the file too.
+		for attr in _LAZY_SLOTS:
+			try:
+				# Unlike getattr(), this doesn't fall back on __getattr__().
+				object.__getattribute__(self, attr)
+			except AttributeError:
+				setattr(self, attr, getattr(parsed, attr))
+
+
+def read_bdf_lazy(stream, codepoints=None):
+	"""
+	Read a BDF-format font from the given file, parsing glyphs on demand.
+
+	stream should be a real file object, since it will be memory-mapped
+	rather than read. Only the header and each glyph's STARTCHAR and ENCODING
+	lines are parsed up front; a glyph's metrics and bitmap are parsed the
+	first time they're used, whether it is reached through font[codepoint] or
+	font.glyphs. codepoints is the same as for read_bdf().
+	"""
+	wanted = _codepoint_filter(codepoints)
+	buf = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+	font, glyphCount, headerEnd = _split_header(buf)
+	for offset, name, codepoint in _index_glyphs(buf, headerEnd, glyphCount):
+		if wanted is None or wanted(codepoint):
+			font.add_glyph(_LazyGlyph(name, codepoint, buf, offset))
+
+	return font
+
+
+def read_bdf_bytes(buf, codepoints=None, keep_source=False):
+	"""
+	Read a BDF-format font from a buffer containing the entire file.
+
+	buf may be a str, bytearray, memoryview or mmap, and codepoints and
+	keep_source are the same as for read_bdf(). The result is the same as
+	read_bdf() would produce, but since all the lines are split out at once,
+	keywords are dispatched through a table and each glyph's bitmap is
+	decoded in one go, it is several times faster on large fonts.
+	"""
+	if isinstance(buf, mmap.mmap):
+		buf = buf[:]
+	elif not isinstance(buf, str):
+		buf = memoryview(buf).tobytes()
+
+	font, glyphCount, headerEnd = _split_header(buf)
+
+	# Each glyph ends with an ENDCHAR line, so splitting on them gives us one
+	# record per glyph, with whatever follows the last glyph left over.
+	records = buf[headerEnd:].split("\nENDCHAR")
+	if len(records) != glyphCount + 1:
+		raise ValueError("Expected %d glyphs, found %d"
+				% (glyphCount, len(records) - 1))
+
+	for glyph in _parse_glyph_records(
+			_select_records(records[:glyphCount], codepoints), keep_source,
+			font.get_pixel_size()):
+		font.add_glyph(glyph)
+
+	assert records[-1].split(None, 1)[0] == "ENDFONT"
+
 	return font
+
+
+class IncrementalReader(object):
+	"""
+	Builds a font from a BDF file that arrives a piece at a time.
+
+	Call feed() with each piece of the file as it arrives, then close() to
+	get the finished font. Each call to feed() only parses the glyphs that
+	the new data completes, so the work is proportional to the data given;
+	an event loop (say, an asyncio protocol's data_received()) can feed it
+	from the network without stalling on one big parse. The result is the
+	same as read_bdf() would produce, and codepoints works the same way.
+	"""
+
+	def __init__(self, codepoints=None):
+		# The font object, once the header has arrived.
+		self.font = None
+		self._codepoints = codepoints
+		self._glyphCount = None
+		self._glyphsSeen = 0
+		# Data we haven't been able to parse yet.
+		self._pending = ""
+
+	def feed(self, data):
+		"""
+		Parse the next piece of the BDF file.
+		"""
+		self._pending += data
+
+		if self.font is None:
+			charsStart = self._pending.find("\nCHARS ")
+			if charsStart < 0 or self._pending.find("\n", charsStart + 1) < 0:
+				# The header isn't all here yet.
+				return
+
+			self.font, self._glyphCount, headerEnd = _split_header(
+					self._pending)
+			self._pending = self._pending[headerEnd:]
+
+		# Parse every glyph whose ENDCHAR has arrived, and keep the rest for
+		# later.
+		end = self._pending.rfind("\nENDCHAR")
+		if end < 0:
+			return
+		records = self._pending[:end].split("\nENDCHAR")
+		self._pending = self._pending[end + len("\nENDCHAR"):]
+
+		self._glyphsSeen += len(records)
+		if self._glyphsSeen > self._glyphCount:
+			raise ValueError("Expected %d glyphs, found %d"
+					% (self._glyphCount, self._glyphsSeen))
+
+		for glyph in _parse_glyph_records(
+				_select_records(records, self._codepoints)):
+			self.font.add_glyph(glyph)
+
+	def close(self):
+		"""
+		Finish parsing, and return the font.
+		"""
+		if self.font is None:
+			raise ValueError("BDF font has no CHARS section")
+		if self._glyphsSeen != self._glyphCount:
+			raise ValueError("Expected %d glyphs, found %d"
+					% (self._glyphCount, self._glyphsSeen))
+
+		assert self._pending.split(None, 1)[0] == "ENDFONT"
+
+		return self.font
+
+
+def _select_records(records, codepoints):
+	"""
+	Returns the glyph definitions in records that codepoints selects.
+	"""
+	wanted = _codepoint_filter(codepoints)
+	if wanted is None:
+		return records
+	return [record for record in records if wanted(_record_codepoint(record))]
+
+
+def _parse_glyph_records(records, keep_source=False, pixel_size=None):
+	"""
+	Build glyphs from a list of glyph definitions.
+
+	Each record should be the text of a glyph definition up to, but not
+	including, ENDCHAR, starting with the newline before STARTCHAR. Returns a
+	list of glyph objects. If keep_source is true, each glyph remembers the
+	text it came from, and that it was written for a font of the given
+	pixel_size (see Glyph.set_source()).
+	"""
+	res = []
+
+	# Most fonts use only a handful of different DWIDTH and BBX values, so
+	# remember the ones we've already parsed.
+	advances = {}
+	boxes = {}
+
+	with util.gc_paused():
+		for record in records:
+			# Glyphs in the usual layout can be picked apart by one regex
+			# match.
+			match = _STANDARD_GLYPH.match(record)
+			if match is None:
+				res.append(_parse_glyph_record(record))
+				continue
+
+			name, codepoint, dwidth, bbx, bitmap = match.groups()
+
+			advance = advances.get(dwidth)
+			if advance is None:
+				advance = advances[dwidth] = int(dwidth.split()[0])
+
+			box = boxes.get(bbx)
+			if box is None:
+				box = boxes[bbx] = [int(val) for val in bbx.split()]
+			bbW, bbH, bbX, bbY = box
+
+			data = None
+			if bitmap.count("\n") + 1 == bbH:
+				data = model.decode_rows(bitmap.replace("\n", ""), bbH,
+						bbW)
+			if data is None:
+				res.append(_parse_glyph_record(record))
+				continue
+
+			glyph = model.Glyph(name.rstrip(), None, bbX, bbY, bbW, bbH,
+					advance, int(codepoint))
+			glyph.data = data
+			res.append(glyph)
+
+		if keep_source:
+			for i, glyph in enumerate(res):
+				# Copying out a definition with Windows line-endings would
+				# leave the output with a mixture, so format those afresh.
+				if "\r" not in records[i]:
+					glyph.set_source(records[i].lstrip() + "\nENDCHAR\n",
+							pixel_size)
+
+	return res
+
+
+# A glyph definition in the usual layout, as written by bdflib and most font
+# editors, up to but not including ENDCHAR.
+_STANDARD_GLYPH = re.compile(
+		r"\nSTARTCHAR ([^\n]*)\n"
+		r"ENCODING (-?\d+)[^\n]*\n"
+		r"(?:SWIDTH [^\n]*\n)?"
+		r"DWIDTH ([^\n]*)\n"
+		r"BBX ([^\n]*)\n"
+		r"BITMAP\n"
+		r"(.*)\Z", re.S)
+
+
+def _parse_glyph_record(record):
+	"""
+	Build a glyph from the text of a glyph definition, up to ENDCHAR.
+
+	This can handle any layout read_bdf() can, but is slower than matching
+	_STANDARD_GLYPH.
+	"""
+	head, _, bitmap = record.partition("\nBITMAP")
+
+	# Build a table of the keywords before BITMAP, so we can pick out the ones
+	# we care about (and skip SWIDTH, ATTRIBUTES, ...) without an if/elif
+	# chain.
+	keywords = {}
+	for line in head.split("\n"):
+		key, _, value = line.strip().partition(' ')
+		keywords[key] = value
+
+	name = keywords.get("STARTCHAR", "")
+	codepoint = int(keywords.get("ENCODING", "-1").split(' ', 1)[0])
+	advance = int(keywords.get("DWIDTH", "0").split(' ', 1)[0])
+	bbW, bbH, bbX, bbY = [int(val)
+			for val in keywords.get("BBX", "0 0 0 0").split()]
+
+	# Everything between BITMAP and ENDCHAR describes the glyph bitmap, so
+	# decode it all at once.
+	rows = bitmap.split()
+	assert len(rows) == bbH
+	data = model.decode_rows("".join(rows), bbH, bbW)
+
+	if data is None:
+		return model.Glyph(name, rows, bbX, bbY, bbW, bbH, advance, codepoint)
+
+	res = model.Glyph(name, None, bbX, bbY, bbW, bbH, advance, codepoint)
+	res.data = data
+	return res
@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from bdflib import cache, reader
+from bdflib.test.test_reader import SAMPLE_FONT
+
+class TestFontCache(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.cacheDir = os.path.join(self.directory, "cache")
+		self.fontPath = os.path.join(self.directory, "sample.bdf")
+		self._write_font(SAMPLE_FONT)
+
+		# Keep track of how many times the font is actually parsed.
+		self.parseCount = 0
+		self._real_read_bdf_bytes = reader.read_bdf_bytes
+		def counting_read_bdf_bytes(*args, **kwargs):
+			self.parseCount += 1
+			return self._real_read_bdf_bytes(*args, **kwargs)
+		reader.read_bdf_bytes = counting_read_bdf_bytes
+
+	def tearDown(self):
+		reader.read_bdf_bytes = self._real_read_bdf_bytes
+		shutil.rmtree(self.directory)
+
+	def _write_font(self, data):
+		with open(self.fontPath, 'wb') as stream:
+			stream.write(data)
+
+	def _check_same_font(self, font, expected):
+		self.failUnlessEqual(font.properties, expected.properties)
+		self.failUnlessEqual(font.get_comments(), expected.get_comments())
+		self.failUnlessEqual(
+				[(g.name, g.codepoint, g.advance, g.get_bounding_box(), g.data)
+					for g in font.glyphs],
+				[(g.name, g.codepoint, g.advance, g.get_bounding_box(), g.data)
+					for g in expected.glyphs],
+			)
+		self.failUnlessEqual(sorted(font.codepoints()),
+				sorted(expected.codepoints()))
+
+	def test_sources_are_cached(self):
+		fontCache = cache.FontCache(self.cacheDir)
+
+		fontCache.read_bdf(self.fontPath, keep_source=True)
+		warm = fontCache.read_bdf(self.fontPath, keep_source=True)
+
+		self.failUnlessEqual(self.parseCount, 1)
+		self.failUnless(warm[106].get_source().startswith("STARTCHAR j\n"))
+		self.failUnless(warm[106].get_source().endswith("\nENDCHAR\n"))
+
+		# Sources are only kept when they're asked for.
+		font = fontCache.read_bdf(self.fontPath)
+		self.failUnlessEqual(self.parseCount, 2)
+		self.failUnlessEqual(font[106].get_source(), None)
+
+	def test_warm_load(self):
+		fontCache = cache.FontCache(self.cacheDir)
+
+		cold = fontCache.read_bdf(self.fontPath)
+		warm = fontCache.read_bdf(self.fontPath)
+
+		# The second load should come straight from the cache.
+		self.failUnlessEqual(self.parseCount, 1)
+		self._check_same_font(warm, cold)
+
+	def test_changed_file(self):
+		fontCache = cache.FontCache(self.cacheDir)
+		fontCache.read_bdf(self.fontPath)
+
+		shorter = SAMPLE_FONT[:SAMPLE_FONT.index("STARTCHAR quoteright")]
+		self._write_font(shorter.replace("CHARS 2", "CHARS 1") + "ENDFONT\n")
+		font = fontCache.read_bdf(self.fontPath)
+
+		self.failUnlessEqual(self.parseCount, 2)
+		self.failUnlessEqual(len(font.glyphs), 1)
+
+		# There should only be one entry for the file.
+		self.failUnlessEqual(len(os.listdir(self.cacheDir)), 1)
+
+	def test_eviction(self):
+		fontCache = cache.FontCache(self.cacheDir)
+		otherPath = os.path.join(self.directory, "other.bdf")
+		shutil.copy(self.fontPath, otherPath)
+
+		fontCache.read_bdf(self.fontPath)
+		entrySize = sum(os.path.getsize(os.path.join(self.cacheDir, name))
+				for name in os.listdir(self.cacheDir))
+
+		# Make the first entry look old, then add another that won't fit.
+		for name in os.listdir(self.cacheDir):
+			os.utime(os.path.join(self.cacheDir, name), (0, 0))
+		fontCache.max_size = entrySize
+		fontCache.read_bdf(otherPath)
+
+		self.failUnlessEqual(len(os.listdir(self.cacheDir)), 1)
+		fontCache.read_bdf(otherPath)
+		self.failUnlessEqual(self.parseCount, 2)
+		fontCache.read_bdf(self.fontPath)
+		self.failUnlessEqual(self.parseCount, 3)
+
+	def test_corrupt_entry(self):
+		fontCache = cache.FontCache(self.cacheDir)
+		fontCache.read_bdf(self.fontPath)
+
+		for name in os.listdir(self.cacheDir):
+			with open(os.path.join(self.cacheDir, name), 'wb') as stream:
+				stream.write("garbage")
+
+		font = fontCache.read_bdf(self.fontPath)
+		self.failUnlessEqual(self.parseCount, 2)
+		self.failUnlessEqual(len(font.glyphs), 2)
+
+	def test_unwritable_cache(self):
+		# The cache directory can't be created under a regular file, but the
+		# font is still read.
+		fontCache = cache.FontCache(os.path.join(self.fontPath, "cache"))
+
+		font = fontCache.read_bdf(self.fontPath)
+		self.failUnlessEqual(len(font.glyphs), 2)
+		font = fontCache.read_bdf(self.fontPath)
+		self.failUnlessEqual(self.parseCount, 2)
+
+	def test_clear(self):
+		fontCache = cache.FontCache(self.cacheDir)
+
+		# Clearing a cache that was never used does nothing.
+		fontCache.clear()
+		self.failIf(os.path.exists(self.cacheDir))
+
+		fontCache.read_bdf(self.fontPath)
+		fontCache.clear()
+		self.failUnlessEqual(os.listdir(self.cacheDir), [])
+		fontCache.read_bdf(self.fontPath)
+		self.failUnlessEqual(self.parseCount, 2)
+
+	def test_read_bdf_without_cache(self):
+		os.environ.pop(cache.CACHE_DIR_VARIABLE, None)
+
+		font = cache.read_bdf(self.fontPath)
+
+		self.failUnlessEqual(len(font.glyphs), 2)
+		self.failIf(os.path.exists(self.cacheDir))
+
+	def test_read_bdf_with_cache(self):
+		cache.read_bdf(self.fontPath, self.cacheDir)
+		cache.read_bdf(self.fontPath, self.cacheDir)
+
+		self.failUnlessEqual(self.parseCount, 1)
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 from bdflib import model
@@ -86,6 +87,31 @@ class TestFont(unittest.TestCase):
 		self.failUnlessEqual(g2.advance, 8)
 		self.failUnlessEqual(g2.codepoint, 1)
 		self.failUnlessEqual(f2[g2.codepoint], g2)
+		self.failUnlessEqual(f2.get_bounding_box(), f.get_bounding_box())
+
+		# The glyphs are separate, even though they start off sharing rows.
+		self.failIf(g2 is g)
+		self.failUnless(g2._data is g._data)
+		g2.merge_glyph(g2, 1,0)
+		g2.advance = 9
+		self.failUnlessEqual(g.get_data(),
+				["10", "00", "00", "00", "00", "80"])
+		self.failUnlessEqual(g.advance, 8)
+		self.failUnlessEqual(f.get_bounding_box(), (-3,-4, 4,6))
+		self.failUnlessEqual(f2.get_bounding_box(), (-3,-4, 5,6))
+
+		g3 = f.copy()[1]
+		g3.data[0] = 3
+		self.failUnlessEqual(g3.get_data(),
+				["10", "00", "00", "00", "00", "30"])
+
+		# That holds for copies pickled together, too.
+		f3, f4 = pickle.loads(pickle.dumps((f, f.copy())))
+		f4[1].data[0] = 3
+		self.failUnlessEqual(f3[1].get_data(),
+				["10", "00", "00", "00", "00", "80"])
+		self.failUnlessEqual(g.get_data(),
+				["10", "00", "00", "00", "00", "80"])
 
 
 class TestGlyph(unittest.TestCase):
@@ -134,6 +160,32 @@ class TestGlyph(unittest.TestCase):
 				bbW=11, bbH=2)
 		self.failUnlessEqual(g.get_data(), ["0100", "8000"])
 
+	def test_glyph_data_decoding(self):
+		"""
+		Bitmaps of any width should decode the same as row-by-row parsing.
+		"""
+		f = model.Font("TestFont", 12, 100,100)
+
+		for width in [1, 7, 8, 9, 16, 20, 32, 33, 64, 65, 100]:
+			digits = (width + 7) // 8 * 2
+			rows = [((1 << width) - 1) >> i << i for i in range(3)]
+			hexRows = ["%0*X" % (digits, row << (digits * 4 - width))
+					for row in rows]
+
+			g = f.new_glyph_from_data("TestGlyph", hexRows, 0,0, width,3)
+			self.failUnlessEqual(g.data, rows[::-1])
+			self.failUnlessEqual(g.get_data(), hexRows)
+
+	def test_ragged_glyph_data(self):
+		"""
+		Rows of different lengths should each be decoded on their own.
+		"""
+		f = model.Font("TestFont", 12, 100,100)
+		g = f.new_glyph_from_data("TestGlyph", ["8", "40 ", "2"],
+				bbW=4, bbH=3)
+
+		self.failUnlessEqual(g.get_data(), ["80", "40", "20"])
+
 	def test_duplicate_codepoints(self):
 		f = model.Font("TestFont", 12, 100,100)
 		g = f.new_glyph_from_data("TestGlyph1", codepoint=1)
@@ -141,6 +193,299 @@ class TestGlyph(unittest.TestCase):
 		self.failUnlessRaises(model.GlyphExists, f.new_glyph_from_data,
 				"TestGlyph2", codepoint=1)
 
+	def test_font_bounding_box(self):
+		f = model.Font("TestFont", 12, 100,100)
+
+		# An empty font's bounding box is just the origin.
+		self.failUnlessEqual(f.get_bounding_box(), (0,0, 0,0))
+
+		f.new_glyph_from_data("TestGlyph1", ["4", "8"], 1,1, 2,2, 3, 1)
+		self.failUnlessEqual(f.get_bounding_box(), (0,0, 3,3))
+
+		g = f.new_glyph_from_data("TestGlyph2", ["4", "8"], -1,-2, 2,2, 3, 2)
+		self.failUnlessEqual(f.get_bounding_box(), (-1,-2, 4,5))
+
+		# Merging into a glyph can grow the font's bounding box.
+		g.merge_glyph(g, 4,0)
+		self.failUnlessEqual(f.get_bounding_box(), (-1,-2, 6,5))
+
+		# So can changing its metrics, which can shrink it too.
+		g.bbW += 2
+		self.failUnlessEqual(f.get_bounding_box(), (-1,-2, 8,5))
+		g.bbX = -3
+		self.failUnlessEqual(f.get_bounding_box(), (-3,-2, 8,5))
+		g.bbX = -1
+		g.bbW -= 2
+		self.failUnlessEqual(f.get_bounding_box(), (-1,-2, 6,5))
+
+		# Removing a glyph inside the bounding box leaves it alone...
+		f.new_glyph_from_data("TestGlyph3", ["4"], 0,0, 2,1, 3, 3)
+		del f[3]
+		self.failUnlessEqual(f.get_bounding_box(), (-1,-2, 6,5))
+
+		# ...but removing one on the edge can shrink it.
+		del f[2]
+		self.failUnlessEqual(f.get_bounding_box(), (0,0, 3,3))
+
+		# Glyphs that have left the font don't affect it any more.
+		g.merge_glyph(g, 10,10)
+		self.failUnlessEqual(f.get_bounding_box(), (0,0, 3,3))
+
+	def test_max_codepoint(self):
+		f = model.Font("TestFont", 12, 100,100)
+		self.failUnlessEqual(f.get_max_codepoint(), -1)
+
+		f.new_glyph_from_data("TestGlyph1", codepoint=5)
+		f.new_glyph_from_data("TestGlyph2", codepoint=10)
+		f.new_glyph_from_data("TestGlyph3")
+		self.failUnlessEqual(f.get_max_codepoint(), 10)
+
+		del f[10]
+		self.failUnlessEqual(f.get_max_codepoint(), 5)
+
+		f.new_glyph_from_data("TestGlyph4", codepoint=7)
+		self.failUnlessEqual(f.get_max_codepoint(), 7)
+
+		del f[7]
+		del f[5]
+		self.failUnlessEqual(f.get_max_codepoint(), -1)
+
+	def test_glyph_removal(self):
+		f = model.Font("TestFont", 12, 100,100)
+		glyphs = [f.new_glyph_from_data("TestGlyph%d" % i, ["8"], i,0, 1,1,
+				2, i) for i in range(10)]
+		unencoded = f.new_glyph_from_data("Unencoded")
+		self.failUnlessEqual(f.get_bounding_box(), (0,0, 10,1))
+		held = f.glyphs
+
+		# Removed glyphs leave the list, which keeps its order.
+		del f[4]
+		self.failIf(4 in f)
+		self.failUnlessRaises(KeyError, f.__delitem__, 4)
+		self.failUnlessEqual(f.glyphs, glyphs[:4] + glyphs[5:] + [unencoded])
+		self.failUnless(f.glyphs is held)
+
+		# Removing in bulk skips codepoints that aren't there.
+		f.remove_codepoints([9, 0, 2, 4, 100])
+		self.failUnlessEqual(sorted(f.codepoints()), [1, 3, 5, 6, 7, 8])
+		self.failUnlessEqual(f.glyphs, [glyphs[i] for i in [1, 3, 5, 6, 7, 8]]
+				+ [unencoded])
+		self.failUnlessEqual(f.get_bounding_box(), (0,0, 9,1))
+		self.failUnlessEqual(f.get_max_codepoint(), 8)
+
+		# A removed glyph can be put back.
+		del f[8]
+		f.add_glyph(glyphs[8])
+		self.failUnlessEqual(f.glyphs, [glyphs[i] for i in [1, 3, 5, 6, 7]]
+				+ [unencoded, glyphs[8]])
+		self.failUnlessEqual(f.get_bounding_box(), (0,0, 9,1))
+
+		# The font's metrics keep up with glyphs that haven't been compacted
+		# away yet.
+		f.remove_codepoints(range(5, 9))
+		del f[3]
+		self.failUnlessEqual(f.get_bounding_box(), (0,0, 2,1))
+		self.failUnlessEqual(f.get_max_codepoint(), 1)
+		self.failUnlessEqual(f.glyphs, [glyphs[1], unencoded])
+
+		copy = pickle.loads(pickle.dumps(f))
+		self.failUnlessEqual([g.name for g in copy.glyphs],
+				["TestGlyph1", "Unencoded"])
+
+	def test_glyph_by_name(self):
+		f = model.Font("TestFont", 12, 100,100)
+		a = f.new_glyph_from_data("a", codepoint=97)
+		first = f.new_glyph_from_data("dup", codepoint=1)
+		unencoded = f.new_glyph_from_data("unencoded")
+
+		self.failUnless(f.glyph_by_name("a") is a)
+		self.failUnless(f.glyph_by_name("unencoded") is unencoded)
+		self.failUnlessRaises(KeyError, f.glyph_by_name, "b")
+
+		# With more than one glyph of the same name, the first one added is
+		# found, until it's removed.
+		second = f.new_glyph_from_data("dup", codepoint=2)
+		self.failUnless(f.glyph_by_name("dup") is first)
+		del f[1]
+		self.failUnless(f.glyph_by_name("dup") is second)
+		f.remove_codepoints([2])
+		self.failUnlessRaises(KeyError, f.glyph_by_name, "dup")
+
+		# Renaming a glyph moves it in the index.
+		a.name = "unencoded"
+		self.failUnlessRaises(KeyError, f.glyph_by_name, "a")
+		self.failUnless(f.glyph_by_name("unencoded") is a)
+
+		copy = pickle.loads(pickle.dumps(f))
+		self.failUnlessEqual(copy.glyph_by_name("unencoded").codepoint, 97)
+
+	def test_font_pickling(self):
+		f = model.Font("TestFont", 12, 100,100)
+		f.new_glyph_from_data("TestGlyph", ["4", "8"], 0,0, 2,2, 3, 1)
+
+		copy = pickle.loads(pickle.dumps(f))
+		self.failUnlessEqual(copy.get_bounding_box(), (0,0, 2,2))
+
+		# The copied glyphs should report back to the copied font.
+		copy[1].merge_glyph(copy[1], 1,0)
+		self.failUnlessEqual(copy.get_bounding_box(), (0,0, 3,2))
+		self.failUnlessEqual(f.get_bounding_box(), (0,0, 2,2))
+
+		# Pickling a glyph shouldn't pickle its font.
+		glyph = pickle.loads(pickle.dumps(f[1]))
+		self.failUnless(glyph._owner is None)
+
+	def test_glyph_source(self):
+		f = model.Font("TestFont", 12, 100,100)
+		g = f.new_glyph_from_data("TestGlyph", ["4", "8"], 0,0, 2,2, 3, 1)
+		self.failUnlessEqual(g.get_source(), None)
+
+		source = "STARTCHAR TestGlyph\nBITMAP\n40\n80\nENDCHAR\n"
+		g.set_source(source)
+		self.failUnlessEqual(g.get_source(), source)
+
+		# Copies of the font keep the source of unmodified glyphs.
+		self.failUnlessEqual(f.copy()[1].get_source(), source)
+
+		# Any change to the glyph makes the source out of date.
+		g.advance += 1
+		self.failUnlessEqual(g.get_source(), None)
+
+		g.set_source(source)
+		g.merge_glyph(g, 0,0)
+		self.failUnlessEqual(g.get_source(), None)
+
+		g.set_source(source)
+		g.data = [1, 2]
+		self.failUnlessEqual(g.get_source(), None)
+
+		g.set_source(source)
+		g.mark_modified()
+		self.failUnlessEqual(g.get_source(), None)
+
+		# Handing out the rows does too, since they might be changed in
+		# place, but get_data() doesn't.
+		g.set_source(source)
+		g.get_data()
+		self.failUnlessEqual(g.get_source(), source)
+		g.data[0] = 3
+		self.failUnlessEqual(g.get_source(), None)
+
+	def test_compact_rows(self):
+		g = model.Glyph("TestGlyph", ["4000", "8001"], 0,0, 16,2, 16, 1)
+
+		# Rows go in the narrowest array that fits them...
+		self.failUnless(isinstance(g.data, model.Rows))
+		self.failUnlessEqual(g.data.itemsize, 2)
+		self.failUnlessEqual(g.data, [0x8001, 0x4000])
+		self.failIf(g.data != [0x8001, 0x4000])
+		self.failIf(hasattr(g, "__dict__"))
+
+		# ...and stay the same object, so sources aren't lost.
+		rows = g.data
+		g.data = rows
+		self.failUnless(g.data is rows)
+
+		# Adding lists gives lists, as it did when the rows were lists.
+		self.failUnlessEqual(g.data + [0], [0x8001, 0x4000, 0])
+		self.failUnlessEqual([0] + g.data, [0, 0x8001, 0x4000])
+		self.failUnlessEqual(type(g.data + [0]), list)
+
+		# Making the glyph wider makes room to widen the rows in place...
+		g = model.Glyph("TestGlyph", ["80", "01"], 0,0, 8,2, 8, 1)
+		g.bbW += 8
+		g.data[0] <<= 8
+		self.failUnlessEqual(g.get_data(), ["0080", "0100"])
+		g.bbW = 9
+		g.data[0] = 0x1FF
+		self.failUnlessEqual(g.get_data(), ["4000", "FF80"])
+
+		# ...even if the rows are shared with a copy.
+		g = model.Glyph("TestGlyph", ["80"], 0,0, 8,1, 8, 1)
+		copy = g.copy()
+		copy.bbW = 16
+		copy.data[0] <<= 8
+		self.failUnlessEqual(g.data, [0x80])
+		self.failUnlessEqual(copy.data, [0x8000])
+
+		# Rows can be decoded straight into compact form.
+		for block, width in [("8001C0F0", 16), ("8010C0F0", 12),
+				("8000001230F0", 20), ("1020", 4)]:
+			rows = model.decode_rows(block, 2, width)
+			self.failUnlessEqual(rows, model.decode_bitmap(block, 2, width))
+			self.failUnless(isinstance(rows, model.Rows))
+			self.failUnlessEqual(rows.typecode,
+					model.make_rows(rows.tolist(), width).typecode)
+		self.failUnlessEqual(model.decode_rows("XY", 1, 8), None)
+
+		# Rows wider than any array type go in a list.
+		g = model.Glyph("Wide", None, 0,0, 200,1, 200, 2)
+		g.data = [1 << 199]
+		self.failUnlessEqual(type(g.data), list)
+		self.failUnlessEqual(g.get_data(), ["80" + "00" * 24])
+
+		# Glyphs still pickle, rows and all.
+		copy = pickle.loads(pickle.dumps(g, pickle.HIGHEST_PROTOCOL))
+		self.failUnlessEqual(copy.data, g.data)
+		self.failUnlessEqual(copy.get_bounding_box(), g.get_bounding_box())
+
+	def test_bitmap_arena(self):
+		f = model.Font("TestFont", 12, 100,100)
+		a = f.new_glyph_from_data("A", ["40", "A0"], 0,0, 3,2, 4, 65)
+		b = f.new_glyph_from_data("B", ["C000", "8001"], 0,0, 16,2, 17, 66)
+		source = "STARTCHAR A\nBITMAP\n40\nA0\nENDCHAR\n"
+		a.set_source(source)
+
+		arena = f.use_arena()
+		# Reading a.data would make its source out of date, so peek at the
+		# rows instead.
+		self.failUnless(a._data.arena is arena)
+		self.failUnless(b.data.arena is arena)
+		self.failUnlessEqual(a._data, [5, 2])
+		self.failUnlessEqual(b.data, [0x8001, 0xC000])
+		self.failUnlessEqual(b.get_data(), ["C000", "8001"])
+		self.failUnlessEqual(a.get_source(), source)
+
+		# Views read and write the arena.
+		b.data[0] = 0x8003
+		self.failUnlessEqual(b.get_data(), ["C000", "8003"])
+		self.failUnlessEqual(b.data[1:], [0xC000])
+		self.failUnless(b.data[1:].arena is arena)
+
+		# Glyphs added later go into the arena too.
+		c = f.new_glyph_from_data("C", ["80"], 0,0, 1,1, 2, 67)
+		self.failUnless(c.data.arena is arena)
+
+		# Compaction drops rows that are no longer used.
+		size = len(arena.buffer)
+		del f[66]
+		compacted = f.compact_arena()
+		self.failUnless(len(compacted.buffer) < size)
+		self.failUnlessEqual([g._data for g in f.glyphs], [[5, 2], [1]])
+		self.failUnlessEqual(a.get_source(), source)
+
+		# Copies share the arena, but not rows that are changed.
+		copy = f.copy()
+		copy[65].data[0] = 7
+		self.failUnless(copy.arena is f.arena)
+		self.failUnless(copy[65].data.arena is f.arena)
+		self.failUnlessEqual(a._data, [5, 2])
+		self.failUnlessEqual(copy[65].data, [7, 2])
+
+		# Pickled fonts keep using an arena.
+		copy = pickle.loads(pickle.dumps(f))
+		self.failUnless(copy[65].data.arena is copy.arena)
+		self.failUnlessEqual(copy[65].data, [5, 2])
+
+		# Glyphs can go back to storing their own rows.
+		c.detach()
+		self.failUnless(isinstance(c.data, model.Rows))
+		f.release_arena()
+		self.failUnless(f.arena is None)
+		self.failUnlessEqual(a._data, [5, 2])
+		self.failUnless(isinstance(a._data, model.Rows))
+		self.failUnlessEqual(a.get_source(), source)
+
 	def test_glyph_merging_no_op(self):
 		f = model.Font("TestFont", 12, 100,100)
 		g = f.new_glyph_from_data("TestGlyph", ["4", "8"], 0,0, 2,2, 3, 1)
@@ -346,3 +691,188 @@ class TestGlyph(unittest.TestCase):
 				0,-2, 2,4, 3, 5)
 		self.failUnlessEqual(g.get_ascent(), 1)
 		self.failUnlessEqual(g.get_descent(), 1)
+
+
+	def test_glyph_ink_metrics(self):
+		f = model.Font("TestFont", 12, 100,100)
+		g = f.new_glyph_from_data("TestGlyph",
+				["00", "30", "48", "00"],
+				-1,-2, 6,4, 7, 1)
+		self.failUnlessEqual(g.get_ink_bounding_box(), (0,-1, 4,2))
+		self.failUnlessEqual(g.get_pixel_count(), 4)
+		self.failUnlessEqual(g.get_ascent(), 1)
+		self.failUnlessEqual(g.get_descent(), 1)
+
+		# The metrics follow changes to the glyph.
+		g.merge_glyph(g, 0,2)
+		self.failUnlessEqual(g.get_ink_bounding_box(), (0,-1, 4,4))
+		self.failUnlessEqual(g.get_pixel_count(), 8)
+		self.failUnlessEqual(g.get_ascent(), 3)
+
+		# That includes changes to the rows in place.
+		g.data[5] = 0x20
+		self.failUnlessEqual(g.get_ascent(), 4)
+		g.data[5] = 0
+		g.data[4] = 0
+		self.failUnlessEqual(g.get_ascent(), 2)
+		self.failUnlessEqual(g.get_pixel_count(), 6)
+		g.data[4] = 0x0C
+
+		g.bbX = 0
+		self.failUnlessEqual(g.get_ink_bounding_box(), (1,-1, 4,4))
+
+		g.data = [1, 0]
+		g.bbH = 2
+		self.failUnlessEqual(g.get_ink_bounding_box(), (5,-2, 1,1))
+		self.failUnlessEqual(g.get_descent(), 2)
+
+		g.data[1] = 0x20
+		self.failUnlessEqual(g.get_ink_bounding_box(), (0,-2, 6,2))
+		self.failUnlessEqual(g.get_pixel_count(), 2)
+
+		# Rows kept from earlier and changed later need mark_modified().
+		rows = g.data
+		self.failUnlessEqual(g.get_pixel_count(), 2)
+		rows[0] = 0
+		g.mark_modified()
+		self.failUnlessEqual(g.get_ink_bounding_box(), (0,-1, 1,1))
+		g.data[0] = 1
+
+		# A glyph with no pixels set has no ink.
+		g = f.new_glyph_from_data("Blank", ["00", "00"], 1,1, 3,2, 4, 2)
+		self.failUnlessEqual(g.get_ink_bounding_box(), (0,0, 0,0))
+		self.failUnlessEqual(g.get_pixel_count(), 0)
+		self.failUnlessEqual(g.get_ascent(), 1)
+		self.failUnlessEqual(g.get_descent(), -3)
+
+		# Copies start off with the same metrics.
+		self.failUnlessEqual(f.copy()[1].get_ink_bounding_box(), (0,-2, 6,2))
+
+	def test_glyph_merged_ink_metrics(self):
+		f = model.Font("TestFont", 12, 100,100)
+		base = f.new_glyph_from_data("o", ["30", "48", "30"], 0,0, 6,3, 7, 1)
+		accent = f.new_glyph_from_data("acute", ["20", "40"], 1,0, 3,2, 4, 2)
+		blank = f.new_glyph_from_data("blank", ["00"], 0,0, 2,1, 2, 3)
+
+		def check(glyph):
+			# The merged glyph's metrics are already cached, and agree with
+			# measuring it afresh.
+			self.failUnless(glyph._ink is not None)
+			self.failUnless(glyph._ink[0] is glyph._data)
+			fresh = glyph.copy()
+			fresh.mark_modified()
+			self.failUnlessEqual(
+					(glyph.get_ascent(), glyph.get_descent(),
+						glyph.get_ink_bounding_box(), glyph.get_pixel_count()),
+					(fresh.get_ascent(), fresh.get_descent(),
+						fresh.get_ink_bounding_box(), fresh.get_pixel_count()),
+				)
+
+		# Build a composite glyph the way FontFiller does.
+		g = f.new_glyph_from_data("oacute", codepoint=4)
+		g.merge_glyph(base, 0,0)
+		check(g)
+		g.merge_glyph(accent, 1,g.get_ascent())
+		check(g)
+		g.merge_glyph(blank, -4,-2)
+		check(g)
+		g.merge_glyph(g, 1,1)
+		check(g)
+
+		# Nothing is measured for glyphs whose metrics were never asked for.
+		g = base.copy()
+		g.mark_modified()
+		g.merge_glyph(accent, 0,3)
+		self.failUnlessEqual(g._ink, None)
+
+		# Bits outside a bitmap can end up inside the merged one.
+		g = f.new_glyph_from_data("stray", ["00"], 0,0, 2,1, 2, 5)
+		g.data[0] = 4
+		g.get_ascent()
+		g.merge_glyph(accent, -5,0)
+		self.failUnlessEqual(g._ink, None)
+		self.failUnlessEqual(g.get_ink_bounding_box(), (-3,0, 3,2))
+
+		# Changing the bounding box forgets the metrics.
+		g = f.new_glyph_from_data("g", ["80"], 0,0, 1,1, 1, 6)
+		self.failUnlessEqual(g.get_ascent(), 1)
+		g.bbY = 2
+		self.failUnlessEqual(g._ink, None)
+		self.failUnlessEqual(g.get_ascent(), 3)
+
+
+class TestArrays(unittest.TestCase):
+
+	def setUp(self):
+		self.font = model.Font("TestFont", 12, 100,100)
+		self.glyph = self.font.new_glyph_from_data("TestGlyph",
+				["00", "1C", "22", "7E"],
+				1,-2, 7,4, 8, 97)
+		self.font.new_glyph_from_data("Wide",
+				["FFFFF8", "800008"],
+				0,0, 21,2, 22, 98)
+		self.font.new_glyph_from_data("space", [], 0,0, 0,0, 4, 32)
+
+	def test_glyph_arrays(self):
+		if model.numpy is None:
+			self.failUnlessRaises(ImportError, self.glyph.to_array)
+			return
+
+		pixels = self.glyph.to_array()
+		self.failUnlessEqual(pixels.tolist(), [
+				[0,0,0,0,0,0,0],
+				[0,0,0,1,1,1,0],
+				[0,0,1,0,0,0,1],
+				[0,1,1,1,1,1,1],
+			])
+		self.failUnlessEqual(self.glyph.to_array(packed=True).tolist(),
+				[[0x00], [0x1C], [0x22], [0x7E]])
+		self.failUnlessEqual(self.font[32].to_array().shape, (0, 0))
+
+		# Turning an array back into a glyph gives the same bitmap, whether
+		# the array is packed or not.
+		g = model.Glyph.from_array("Copy", pixels, 1,-2, 8, 97)
+		self.failUnlessEqual(g.get_bounding_box(), (1,-2, 7,4))
+		self.failUnlessEqual(g.data, self.glyph.data)
+
+		g = model.Glyph.from_array("Copy",
+				self.glyph.to_array(packed=True), 1,-2, 8, 97, width=7)
+		self.failUnlessEqual(g.data, self.glyph.data)
+
+		self.failUnlessRaises(ValueError, model.Glyph.from_array, "Bad",
+				[[0x7E]], width=9)
+		self.failUnlessRaises(ValueError, model.Glyph.from_array, "Bad",
+				[0, 1, 0])
+
+	def test_font_arrays(self):
+		if model.numpy is None:
+			self.failUnlessRaises(ImportError, self.font.to_array)
+			return
+
+		# Every glyph is drawn in the font bounding box.
+		self.failUnlessEqual(self.font.get_bounding_box(), (0,-2, 21,4))
+		stack = self.font.to_array()
+		self.failUnlessEqual(stack.shape, (3, 4, 21))
+		self.failUnlessEqual(stack[0, :, :8].tolist(), [
+				[0,0,0,0,0,0,0,0],
+				[0,0,0,0,1,1,1,0],
+				[0,0,0,1,0,0,0,1],
+				[0,0,1,1,1,1,1,1],
+			])
+		self.failUnlessEqual(stack[1, 0].tolist(), [1] * 21)
+		self.failUnlessEqual(stack[1, 1].tolist(), [1] + [0] * 19 + [1])
+		self.failUnlessEqual(stack[2].any(), False)
+
+		# Writing the stack back trims each glyph to its pixels.
+		stack[1, 3, 20] = 1
+		self.font.update_from_array(stack)
+		self.failUnlessEqual(self.glyph.get_bounding_box(), (2,-2, 6,3))
+		self.failUnlessEqual(self.glyph.get_data(), ["38", "44", "FC"])
+		self.failUnlessEqual(self.font[98].get_bounding_box(), (0,-2, 21,4))
+		self.failUnlessEqual(self.font[98].get_data(),
+				["FFFFF8", "800008", "000000", "000008"])
+		self.failUnlessEqual(self.font[32].get_bounding_box(), (0,0, 0,0))
+		self.failUnlessEqual(self.font.get_bounding_box(), (0,-2, 21,4))
+
+		self.failUnlessRaises(ValueError, self.font.update_from_array,
+				stack[:2])
@@ -0,0 +1,97 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+try:
+	from cStringIO import StringIO
+except ImportError:
+	from StringIO import StringIO
+
+from bdflib import packed, reader
+from bdflib.test.test_reader import SAMPLE_FONT
+
+def _glyph_info(font):
+	return [(g.name, g.codepoint, g.get_bounding_box(), g.advance, g.data)
+			for g in font.glyphs]
+
+class TestPackedFont(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.font = reader.read_bdf(iter(SAMPLE_FONT.split("\n")))
+		self.font.new_glyph_from_data("empty", [], 0,0, 0,0, 4, -1)
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def _load(self, font):
+		path = os.path.join(self.directory, "font.pack")
+		with open(path, 'wb') as stream:
+			packed.write_packed(font, stream)
+		with open(path, 'rb') as stream:
+			return packed.read_packed(stream)
+
+	def test_round_trip(self):
+		copy = self._load(self.font)
+
+		self.failUnlessEqual(_glyph_info(copy), _glyph_info(self.font))
+		self.failUnlessEqual(copy.properties, self.font.properties)
+		self.failUnlessEqual(copy.comments, self.font.comments)
+		self.failUnlessEqual(copy.get_bounding_box(),
+				self.font.get_bounding_box())
+		self.failUnlessEqual(sorted(copy.codepoints()),
+				sorted(self.font.codepoints()))
+
+	def test_lookups_unpack_only_what_they_need(self):
+		copy = self._load(self.font)
+
+		glyph = copy[39]
+		self.failUnlessEqual(glyph.name, "quoteright")
+		self.failUnless(106 in copy)
+		self.failIf(65 in copy)
+		self.failUnlessRaises(KeyError, copy.__getitem__, 65)
+		self.failUnlessEqual(copy.get_bounding_box(),
+				self.font.get_bounding_box())
+		self.failUnlessEqual(copy.get_max_codepoint(), 106)
+		self.failUnlessEqual(sorted(copy.codepoints()), [39, 106])
+
+		# None of that needed the list of glyphs, or any other bitmap.
+		self.failIf("_glyphs" in copy.__dict__)
+		self.failUnlessEqual(len(copy._unpacked), 1)
+
+		# Glyphs looked up earlier are the same objects as in the list.
+		self.failUnless(copy.glyphs[1] is glyph)
+		self.failUnless(copy[39] is glyph)
+
+	def test_modification(self):
+		copy = self._load(self.font)
+
+		del copy[106]
+		copy.new_glyph_from_data("A", ["80"], 0,0, 1,1, 2, 65)
+
+		self.failUnlessEqual([g.codepoint for g in copy.glyphs],
+				[39, -1, 65])
+		self.failUnlessEqual(copy.get_max_codepoint(), 65)
+
+		# Glyphs resized before their bitmaps are unpacked keep their rows.
+		copy[39].bbW += 8
+		copy[39].bbH += 1
+		self.failUnlessEqual(copy[39].data, self.font[39].data)
+		self.failUnlessEqual(copy[39].data.itemsize, 2)
+
+	def test_shared_glyphs(self):
+		self.font.glyphs_by_codepoint[0x2019] = self.font[39]
+		copy = self._load(self.font)
+
+		self.failUnless(copy[0x2019] is copy[39])
+		self.failUnless(copy.glyphs_by_codepoint[0x2019] is copy.glyphs[1])
+
+	def test_pickling(self):
+		copy = pickle.loads(pickle.dumps(self._load(self.font)))
+
+		self.failUnlessEqual(_glyph_info(copy), _glyph_info(self.font))
+		self.failUnless(copy[39] is copy.glyphs[1])
+
+	def test_not_packed(self):
+		self.failUnlessRaises(ValueError, packed.PackedFont, SAMPLE_FONT)
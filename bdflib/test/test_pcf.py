@@ -0,0 +1,105 @@
+import struct
+import unittest
+try:
+	from cStringIO import StringIO
+except ImportError:
+	from StringIO import StringIO
+
+from bdflib import model, pcf, reader
+from bdflib.test.test_reader import SAMPLE_FONT
+
+def _glyph_info(font):
+	return [(g.name, g.codepoint, g.get_bounding_box(), g.advance, g.data)
+			for g in font.glyphs]
+
+def _table(data, tableType):
+	"""
+	Returns the contents of the given table in PCF-format data.
+	"""
+	count, = struct.unpack_from("<i", data, 4)
+	for i in range(count):
+		entryType, format, size, offset = struct.unpack_from("<iiii", data,
+				8 + 16 * i)
+		if entryType == tableType:
+			return data[offset:offset + size]
+
+class TestPCF(unittest.TestCase):
+
+	def setUp(self):
+		self.font = reader.read_bdf(iter(SAMPLE_FONT.split("\n")))
+
+	def _round_trip(self, font, **kwargs):
+		stream = StringIO()
+		pcf.write_pcf(font, stream, **kwargs)
+		return pcf.read_pcf(StringIO(stream.getvalue()))
+
+	def test_round_trip(self):
+		copy = self._round_trip(self.font)
+
+		self.failUnlessEqual(_glyph_info(copy), _glyph_info(self.font))
+		self.failUnlessEqual(copy["FACE_NAME"], self.font["FACE_NAME"])
+		self.failUnlessEqual(copy["POINT_SIZE"], self.font["POINT_SIZE"])
+		self.failUnlessEqual(copy["RESOLUTION_Y"], self.font["RESOLUTION_Y"])
+		self.failUnlessEqual(copy["COPYRIGHT"], self.font["COPYRIGHT"])
+		self.failUnlessEqual(copy["FONT_ASCENT"], 21)
+
+	def test_all_formats(self):
+		expected = _glyph_info(self.font)
+		for glyph_pad in (1, 2, 4, 8):
+			for scan_unit in (1, 2, 4):
+				if scan_unit > glyph_pad:
+					continue
+				for msb_bit_first in (True, False):
+					for msb_byte_first in (True, False):
+						copy = self._round_trip(self.font, glyph_pad=glyph_pad,
+								scan_unit=scan_unit,
+								msb_bit_first=msb_bit_first,
+								msb_byte_first=msb_byte_first)
+						self.failUnlessEqual(_glyph_info(copy), expected)
+
+	def test_bitmap_layout(self):
+		font = model.Font("TestFont", 12, 100, 100)
+		font.new_glyph_from_data("TestGlyph", ["60", "80"], 0,0, 3,2, 4, 65)
+
+		stream = StringIO()
+		pcf.write_pcf(font, stream, glyph_pad=2, scan_unit=1,
+				msb_bit_first=False, msb_byte_first=False)
+		table = _table(stream.getvalue(), pcf.PCF_BITMAPS)
+
+		# Format, glyph count, offsets, sizes for each padding, then each
+		# row padded to two bytes with the leftmost pixel in the low bit.
+		self.failUnlessEqual(table, struct.pack("<iii4i",
+				0x01, 1, 0, 2, 4, 8, 16) + "\x06\x00\x01\x00")
+
+	def test_large_metrics(self):
+		font = model.Font("TestFont", 12, 100, 100)
+		font.new_glyph_from_data("Wide", ["FF" * 25], 0,0, 200,1, 200, 65)
+
+		stream = StringIO()
+		pcf.write_pcf(font, stream)
+		format, = struct.unpack_from("<i",
+				_table(stream.getvalue(), pcf.PCF_METRICS))
+		self.failUnlessEqual(format & pcf.PCF_FORMAT_MASK,
+				pcf.PCF_DEFAULT_FORMAT)
+
+		copy = pcf.read_pcf(StringIO(stream.getvalue()))
+		self.failUnlessEqual(_glyph_info(copy), _glyph_info(font))
+
+	def test_unencodable_codepoints(self):
+		font = model.Font("TestFont", 12, 100, 100)
+		font.new_glyph_from_data("Smiley", ["80"], 0,0, 1,1, 1, 0x263A)
+		font.new_glyph_from_data("Emoji", ["80"], 0,0, 1,1, 1, 0x1F600)
+
+		copy = self._round_trip(font)
+		self.failUnlessEqual([(g.name, g.codepoint) for g in copy.glyphs],
+				[("Smiley", 0x263A), ("Emoji", -1)])
+
+	def test_bad_options(self):
+		self.failUnlessRaises(ValueError, pcf.write_pcf, self.font,
+				StringIO(), glyph_pad=3)
+		self.failUnlessRaises(ValueError, pcf.write_pcf, self.font,
+				StringIO(), glyph_pad=1, scan_unit=2)
+
+	def test_not_pcf(self):
+		self.failUnlessRaises(ValueError, pcf.read_pcf,
+				StringIO(SAMPLE_FONT))
@@ -0,0 +1,107 @@
+import struct
+import unittest
+try:
+	from cStringIO import StringIO
+except ImportError:
+	from StringIO import StringIO
+
+from bdflib import model, psf, reader
+from bdflib.test.test_reader import SAMPLE_FONT
+
+def _pixels(glyph, left=0):
+	"""
+	Returns the set of lit pixels in the glyph, relative to its origin.
+	"""
+	return set((glyph.bbX + x - left, glyph.bbY + y)
+			for y, row in enumerate(glyph.data)
+			for x in range(glyph.bbW)
+			if row >> (glyph.bbW - x - 1) & 1)
+
+class TestPSF(unittest.TestCase):
+
+	def setUp(self):
+		self.font = model.Font("TestFont", 12, 100, 100)
+		self.font.new_glyph_from_data("A", ["40", "A0", "E0"], 0,0, 3,3, 4, 65)
+		self.font.new_glyph_from_data("comma", ["80", "80"], 1,-1, 1,2, 4,
+				44)
+
+	def test_writing(self):
+		stream = StringIO()
+		psf.write_psf(self.font, stream)
+
+		self.failUnlessEqual(stream.getvalue(),
+				struct.pack("<4s7I", psf.PSF2_MAGIC, 0, 32, 1, 2, 4, 4, 3)
+				# The cell goes from the top of "A" to the bottom of "comma".
+				+ "\x40\xA0\xE0\x00"
+				+ "\x00\x00\x40\x40"
+				+ "A\xff,\xff"
+			)
+
+	def test_round_trip(self):
+		stream = StringIO()
+		psf.write_psf(self.font, stream)
+		copy = psf.read_psf(StringIO(stream.getvalue()), "Copy", 1)
+
+		self.failUnlessEqual(copy["FACE_NAME"], "Copy")
+		self.failUnlessEqual(copy.get_bounding_box(), (0, -1, 3, 4))
+		self.failUnlessEqual(
+				[(g.codepoint, _pixels(g)) for g in copy.glyphs],
+				[(g.codepoint, _pixels(g)) for g in self.font.glyphs],
+			)
+
+	def test_changed_glyph_metrics(self):
+		psf.write_psf(self.font, StringIO())
+
+		# Moving a glyph after the font has been measured should still make
+		# the cells big enough for it.
+		self.font[44].bbY = -3
+		stream = StringIO()
+		psf.write_psf(self.font, stream)
+		header = struct.unpack_from("<4s7I", stream.getvalue())
+		self.failUnlessEqual(header[5:], (6, 6, 3))
+
+		copy = psf.read_psf(StringIO(stream.getvalue()), "Copy", 3)
+		self.failUnlessEqual(
+				[(g.codepoint, _pixels(g)) for g in copy.glyphs],
+				[(g.codepoint, _pixels(g)) for g in self.font.glyphs],
+			)
+
+	def test_wide_glyphs(self):
+		font = reader.read_bdf(iter(SAMPLE_FONT.split("\n")))
+
+		stream = StringIO()
+		psf.write_psf(font, stream)
+		copy = psf.read_psf(StringIO(stream.getvalue()), descent=6)
+
+		# PSF2 can't record that the cell starts left of the origin.
+		left = font.get_bounding_box()[0]
+		self.failUnlessEqual(
+				[(g.codepoint, _pixels(g)) for g in copy.glyphs],
+				[(g.codepoint, _pixels(g, left)) for g in font.glyphs],
+			)
+
+	def test_shared_glyphs(self):
+		self.font.glyphs_by_codepoint[0x1F600] = self.font[65]
+
+		stream = StringIO()
+		psf.write_psf(self.font, stream)
+		self.failUnless(stream.getvalue().endswith(
+				"A\xf0\x9f\x98\x80\xff,\xff"))
+
+		copy = psf.read_psf(StringIO(stream.getvalue()))
+		self.failUnlessEqual([g.codepoint for g in copy.glyphs],
+				[65, 0x1F600, 44])
+		self.failUnlessEqual(copy[0x1F600].data, copy[65].data)
+
+	def test_sequences_ignored(self):
+		data = (struct.pack("<4s7I", psf.PSF2_MAGIC, 0, 32, 1, 2, 1, 1, 1)
+				+ "\x80\x00"
+				+ "A\xfeA\xcc\x81\xff\xff")
+		font = psf.read_psf(StringIO(data))
+
+		self.failUnlessEqual([(g.codepoint, g.data) for g in font.glyphs],
+				[(65, [1]), (-1, [0])])
+
+	def test_not_psf(self):
+		self.failUnlessRaises(ValueError, psf.read_psf,
+				StringIO(SAMPLE_FONT))
@@ -1,5 +1,9 @@
+import gzip
+import os
+import shutil
 import unittest
 import tempfile
+from multiprocessing.pool import ThreadPool
 try:
 	from cStringIO import StringIO
 except ImportError:
@@ -89,7 +93,7 @@ class TestGlyph(unittest.TestCase):
 		testFont = model.Font("Adobe Helvetica", 24, 75, 75)
 		testGlyphData = iter(SAMPLE_FONT.split('\n')[27:56])
 
-		reader._read_glyph(testGlyphData, testFont)
+		testFont.new_glyph_from_data(*reader._parse_glyph(testGlyphData))
 
 		# The font should now have an entry for j.
 		testGlyph = testFont[106]
@@ -253,3 +257,368 @@ class TestReadFont(unittest.TestCase):
 		self.failUnlessEqual(font["RESOLUTION_X"], 2)
 		self.failUnlessEqual(font["RESOLUTION_Y"], 3)
 		self.failIf("PIXEL_SIZE" in font)
+
+
+	def test_parallel_parsing(self):
+		"""
+		Parsing glyphs in worker processes should give the same font.
+		"""
+		expected = reader.read_bdf(StringIO(SAMPLE_FONT))
+
+		for source in [StringIO(SAMPLE_FONT), SAMPLE_FONT.split('\n')]:
+			font = reader.read_bdf(source, workers=2)
+
+			self.failUnlessEqual(font.properties, expected.properties)
+			self.failUnlessEqual(font.get_comments(),
+					expected.get_comments())
+			self.failUnlessEqual(len(font.glyphs), len(expected.glyphs))
+			for g, e in zip(font.glyphs, expected.glyphs):
+				self.failUnlessEqual(g.name, e.name)
+				self.failUnlessEqual(g.codepoint, e.codepoint)
+				self.failUnlessEqual(g.advance, e.advance)
+				self.failUnlessEqual(g.get_bounding_box(),
+						e.get_bounding_box())
+				self.failUnlessEqual(g.data, e.data)
+			self.failUnlessEqual(sorted(font.glyphs_by_codepoint.keys()),
+					sorted(expected.glyphs_by_codepoint.keys()))
+
+	def test_codepoint_filter(self):
+		"""
+		Only the selected glyphs should be read, and the others not decoded.
+		"""
+		# Break the bitmap of quoteright, so we'd notice if it was decoded.
+		head, tail = SAMPLE_FONT.split("STARTCHAR quoteright")
+		brokenFont = head + "STARTCHAR quoteright" + tail.replace("E0", "XX")
+
+		readers = [
+				lambda codepoints: reader.read_bdf(StringIO(brokenFont),
+					codepoints=codepoints),
+				lambda codepoints: reader.read_bdf(StringIO(brokenFont),
+					workers=2, codepoints=codepoints),
+				lambda codepoints: reader.read_bdf_bytes(brokenFont,
+					codepoints),
+			]
+		for read in readers:
+			for codepoints in [set([106, 200]), lambda cp: cp >= 100]:
+				font = read(codepoints)
+				self.failUnlessEqual([g.name for g in font.glyphs], ["j"])
+				self.failUnlessEqual(font.codepoints(), [106])
+				self.failUnlessEqual(font[106].bbH, 22)
+
+			font = read(set())
+			self.failUnlessEqual(font.glyphs, [])
+			self.failUnlessEqual(font["FACE_NAME"],
+					"-Adobe-Helvetica-Bold-R-Normal--24-240-75-75-P-65-"
+					"ISO8859-1")
+
+
+class TestReadHeader(unittest.TestCase):
+
+	def test_basic_operation(self):
+		lines = iter(SAMPLE_FONT.split('\n'))
+		font, glyphCount = reader.read_bdf_header(lines)
+		expected = reader.read_bdf(StringIO(SAMPLE_FONT))
+
+		self.failUnlessEqual(glyphCount, 2)
+		self.failUnlessEqual(font.properties, expected.properties)
+		self.failUnlessEqual(font.get_comments(), expected.get_comments())
+		self.failUnlessEqual(font.glyphs, [])
+
+		# Nothing after the CHARS line should have been read.
+		self.failUnlessEqual(lines.next(), "STARTCHAR j")
+
+	def test_missing_chars(self):
+		self.failUnlessRaises(ValueError, reader.read_bdf_header,
+				SAMPLE_FONT.split('\n')[:26])
+
+
+class TestIterFont(unittest.TestCase):
+
+	def test_basic_operation(self):
+		items = list(reader.iter_bdf(StringIO(SAMPLE_FONT)))
+		expected = reader.read_bdf(StringIO(SAMPLE_FONT))
+
+		# The first item is the font header, without any glyphs.
+		header = items[0]
+		self.failUnlessEqual(header.properties, expected.properties)
+		self.failUnlessEqual(header.get_comments(), expected.get_comments())
+		self.failUnlessEqual(header.glyphs, [])
+
+		# The rest are the glyphs, in file order.
+		glyphs = items[1:]
+		self.failUnlessEqual([g.name for g in glyphs], ["j", "quoteright"])
+		for g, e in zip(glyphs, expected.glyphs):
+			self.failUnlessEqual(g.codepoint, e.codepoint)
+			self.failUnlessEqual(g.advance, e.advance)
+			self.failUnlessEqual(g.get_bounding_box(), e.get_bounding_box())
+			self.failUnlessEqual(g.get_data(), e.get_data())
+
+	def test_reads_incrementally(self):
+		lines = iter(SAMPLE_FONT.split('\n'))
+		items = reader.iter_bdf(lines)
+
+		items.next()
+		items.next()
+
+		# Reading the first glyph should stop at its ENDCHAR.
+		self.failUnlessEqual(lines.next(), "STARTCHAR quoteright")
+
+
+class TestReadFontLazy(unittest.TestCase):
+
+	def setUp(self):
+		self.fontFile = tempfile.TemporaryFile()
+		self.fontFile.write(SAMPLE_FONT)
+		self.fontFile.flush()
+
+	def tearDown(self):
+		self.fontFile.close()
+
+	def test_matches_read_bdf(self):
+		font = reader.read_bdf_lazy(self.fontFile)
+		expected = reader.read_bdf(StringIO(SAMPLE_FONT))
+
+		self.failUnlessEqual(font.properties, expected.properties)
+		self.failUnlessEqual(font.get_comments(), expected.get_comments())
+		self.failUnlessEqual(sorted(font.codepoints()), [39, 106])
+		for g, e in zip(font.glyphs, expected.glyphs):
+			self.failUnlessEqual(g.name, e.name)
+			self.failUnlessEqual(g.codepoint, e.codepoint)
+			self.failUnlessEqual(g.advance, e.advance)
+			self.failUnlessEqual(g.get_bounding_box(), e.get_bounding_box())
+			self.failUnlessEqual(g.get_data(), e.get_data())
+
+	def test_glyphs_are_parsed_on_demand(self):
+		font = reader.read_bdf_lazy(self.fontFile)
+
+		# Names and codepoints come from the index...
+		self.failUnlessEqual([g.name for g in font.glyphs],
+				["j", "quoteright"])
+		self.failUnless("_buf" in font[106].__dict__)
+
+		# ...but touching the glyph's bitmap parses it.
+		self.failUnlessEqual(font[106].bbH, 22)
+		self.failIf("_buf" in font[106].__dict__)
+		self.failUnless("_buf" in font[39].__dict__)
+
+	def test_changes_before_parsing(self):
+		font = reader.read_bdf_lazy(self.fontFile)
+
+		# Attributes set before a glyph is parsed aren't overwritten by it.
+		g = font[106]
+		g.advance = 20
+		g.codepoint = 500
+		g.name = "jay"
+		self.failUnless("_buf" in g.__dict__)
+		self.failUnlessEqual(g.bbW, 9)
+		self.failUnlessEqual((g.advance, g.codepoint, g.name),
+				(20, 500, "jay"))
+
+		# Changing the metrics parses the glyph first, so the font's
+		# bounding box takes them into account.
+		g = font[39]
+		g.bbH = 30
+		self.failIf("_buf" in g.__dict__)
+		self.failUnlessEqual(g.get_bounding_box(), (2,12, 4,30))
+		self.failUnlessEqual(len(g.data), 6)
+		self.failUnlessEqual(font.get_bounding_box()[3], 48)
+
+	def test_codepoint_filter(self):
+		font = reader.read_bdf_lazy(self.fontFile, [39])
+
+		self.failUnlessEqual([g.name for g in font.glyphs], ["quoteright"])
+		self.failIf(106 in font)
+
+
+class TestReadFontBytes(unittest.TestCase):
+
+	def _check_same_font(self, font, expected):
+		self.failUnlessEqual(font.properties, expected.properties)
+		self.failUnlessEqual(font.get_comments(), expected.get_comments())
+		self.failUnlessEqual(len(font.glyphs), len(expected.glyphs))
+		for g, e in zip(font.glyphs, expected.glyphs):
+			self.failUnlessEqual(g.name, e.name)
+			self.failUnlessEqual(g.codepoint, e.codepoint)
+			self.failUnlessEqual(g.advance, e.advance)
+			self.failUnlessEqual(g.get_bounding_box(), e.get_bounding_box())
+			self.failUnlessEqual(g.data, e.data)
+
+	def test_matches_read_bdf(self):
+		expected = reader.read_bdf(StringIO(SAMPLE_FONT))
+
+		for buf in [SAMPLE_FONT, bytearray(SAMPLE_FONT),
+				memoryview(SAMPLE_FONT)]:
+			self._check_same_font(reader.read_bdf_bytes(buf), expected)
+
+	def test_windows_line_endings(self):
+		expected = reader.read_bdf(StringIO(SAMPLE_FONT))
+		font = reader.read_bdf_bytes(SAMPLE_FONT.replace("\n", "\r\n"))
+
+		self._check_same_font(font, expected)
+
+	def test_unusual_layout(self):
+		"""
+		Glyphs that don't follow the usual keyword order should still work.
+		"""
+		bdf_data = (
+				"STARTFONT 2.1\n"
+				"FONT TestFont\n"
+				"SIZE 12 100 100\n"
+				"FONTBOUNDINGBOX 3 2 0 0\n"
+				"CHARS 2\n"
+				"STARTCHAR  two  spaces\n"
+				"BBX 3 2 0 0\n"
+				"DWIDTH 4 0\n"
+				"ENCODING 65\n"
+				"BITMAP\n"
+				"A0 \n"
+				"40\n"
+				"ENDCHAR\n"
+				"STARTCHAR empty\n"
+				"ENCODING 32\n"
+				"DWIDTH 4 0\n"
+				"BBX 0 0 0 0\n"
+				"BITMAP\n"
+				"ENDCHAR\n"
+				"ENDFONT\n"
+			)
+		expected = reader.read_bdf(StringIO(bdf_data))
+		font = reader.read_bdf_bytes(bdf_data)
+
+		self._check_same_font(font, expected)
+		self.failUnlessEqual(font[65].name, " two  spaces")
+		self.failUnlessEqual(font[65].get_data(), ["A0", "40"])
+
+	def test_keep_source(self):
+		font = reader.read_bdf_bytes(SAMPLE_FONT, keep_source=True)
+		start = SAMPLE_FONT.index("STARTCHAR quoteright")
+		end = SAMPLE_FONT.index("ENDFONT")
+		self.failUnlessEqual(font[39].get_source(), SAMPLE_FONT[start:end])
+
+		# Windows line-endings aren't copied out.
+		font = reader.read_bdf_bytes(SAMPLE_FONT.replace("\n", "\r\n"),
+				keep_source=True)
+		self.failUnlessEqual(font[39].get_source(), None)
+
+		# Without keep_source, glyphs don't remember where they came from.
+		font = reader.read_bdf_bytes(SAMPLE_FONT)
+		self.failUnlessEqual(font[39].get_source(), None)
+
+	def test_wrong_glyph_count(self):
+		self.failUnlessRaises(ValueError, reader.read_bdf_bytes,
+				SAMPLE_FONT.replace("CHARS 2", "CHARS 3"))
+
+
+class TestIncrementalReader(unittest.TestCase):
+
+	def test_matches_read_bdf(self):
+		expected = reader.read_bdf(StringIO(SAMPLE_FONT))
+
+		for chunkSize in [1, 7, 100, len(SAMPLE_FONT)]:
+			incremental = reader.IncrementalReader()
+			for i in range(0, len(SAMPLE_FONT), chunkSize):
+				incremental.feed(SAMPLE_FONT[i:i + chunkSize])
+			font = incremental.close()
+
+			self.failUnlessEqual(font.properties, expected.properties)
+			self.failUnlessEqual(font.get_comments(),
+					expected.get_comments())
+			self.failUnlessEqual(
+					[(g.name, g.codepoint, g.get_bounding_box(), g.data)
+						for g in font.glyphs],
+					[(g.name, g.codepoint, g.get_bounding_box(), g.data)
+						for g in expected.glyphs],
+				)
+
+	def test_parses_as_data_arrives(self):
+		incremental = reader.IncrementalReader()
+		head, tail = SAMPLE_FONT.split("STARTCHAR quoteright")
+
+		incremental.feed(head)
+		self.failUnlessEqual([g.name for g in incremental.font.glyphs],
+				["j"])
+
+		incremental.feed("STARTCHAR quoteright" + tail)
+		self.failUnlessEqual([g.name for g in incremental.close().glyphs],
+				["j", "quoteright"])
+
+	def test_codepoint_filter(self):
+		incremental = reader.IncrementalReader(codepoints=[39])
+		incremental.feed(SAMPLE_FONT)
+
+		self.failUnlessEqual([g.name for g in incremental.close().glyphs],
+				["quoteright"])
+
+	def test_truncated_font(self):
+		incremental = reader.IncrementalReader()
+		incremental.feed(SAMPLE_FONT[:100])
+		self.failUnlessRaises(ValueError, incremental.close)
+
+		incremental = reader.IncrementalReader()
+		head, tail = SAMPLE_FONT.split("STARTCHAR quoteright")
+		incremental.feed(head)
+		self.failUnlessRaises(ValueError, incremental.close)
+
+
+class TestReadMany(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+		self.goodPath = os.path.join(self.directory, "good.bdf")
+		with open(self.goodPath, 'wb') as stream:
+			stream.write(SAMPLE_FONT)
+
+		self.gzipPath = os.path.join(self.directory, "good.bdf.gz")
+		with gzip.GzipFile(self.gzipPath, 'wb') as stream:
+			stream.write(SAMPLE_FONT.replace("Helvetica", "Zipped"))
+
+		self.badPath = os.path.join(self.directory, "bad.bdf")
+		with open(self.badPath, 'wb') as stream:
+			stream.write(SAMPLE_FONT.replace("CHARS 2", "CHARS 3"))
+
+		self.missingPath = os.path.join(self.directory, "missing.bdf")
+
+		self.paths = [self.goodPath, self.badPath, self.gzipPath,
+				self.missingPath]
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def _check_results(self, results):
+		results = dict((path, (font, error))
+				for path, font, error in results)
+		self.failUnlessEqual(sorted(results), sorted(self.paths))
+
+		expected = reader.read_bdf(StringIO(SAMPLE_FONT))
+		for path in [self.goodPath, self.gzipPath]:
+			font, error = results[path]
+			self.failUnlessEqual(error, None)
+			self.failUnlessEqual(
+					[(g.name, g.codepoint, g.get_bounding_box(), g.data)
+						for g in font.glyphs],
+					[(g.name, g.codepoint, g.get_bounding_box(), g.data)
+						for g in expected.glyphs],
+				)
+		self.failUnlessEqual(results[self.goodPath][0]["FAMILY"],
+				"Helvetica")
+		self.failUnlessEqual(results[self.gzipPath][0]["FAMILY"], "Zipped")
+
+		font, error = results[self.badPath]
+		self.failUnlessEqual(font, None)
+		self.failUnless(isinstance(error, ValueError))
+
+		font, error = results[self.missingPath]
+		self.failUnlessEqual(font, None)
+		self.failUnless(isinstance(error, IOError))
+
+	def test_process_pool(self):
+		self._check_results(reader.read_many(self.paths))
+
+	def test_thread_pool(self):
+		pool = ThreadPool(2)
+		try:
+			self._check_results(reader.read_many(self.paths, pool))
+		finally:
+			pool.close()
+			pool.join()
@@ -0,0 +1,84 @@
+import bz2
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+from bdflib import reader, util, writer
+from bdflib.test.test_reader import SAMPLE_FONT
+
+class TestOpenFont(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def _path(self, name):
+		return os.path.join(self.directory, name)
+
+	def _round_trip(self, name):
+		"""
+		Writes the sample font to the named file and reads it back.
+		"""
+		font = reader.read_bdf(iter(SAMPLE_FONT.split("\n")))
+		with util.open_font(self._path(name), 'w', 6) as stream:
+			writer.write_bdf(font, stream)
+
+		expected = StringIO()
+		writer.write_bdf(font, expected)
+		with util.open_font(self._path(name)) as stream:
+			self.failUnlessEqual(stream.read(), expected.getvalue())
+
+		with util.open_font(self._path(name)) as stream:
+			copy = reader.read_bdf(stream)
+
+		self.failUnlessEqual(
+				[(g.name, g.codepoint, g.get_bounding_box(), g.data)
+					for g in copy.glyphs],
+				[(g.name, g.codepoint, g.get_bounding_box(), g.data)
+					for g in font.glyphs],
+			)
+
+	def test_plain_files(self):
+		self._round_trip("sample.bdf")
+
+		with open(self._path("sample.bdf"), 'rb') as stream:
+			self.failUnless(stream.read().startswith("STARTFONT"))
+
+	def test_gzip_files(self):
+		self._round_trip("sample.bdf.gz")
+
+		with gzip.GzipFile(self._path("sample.bdf.gz"), 'rb') as stream:
+			self.failUnless(stream.read().startswith("STARTFONT"))
+
+	def test_bz2_files(self):
+		self._round_trip("sample.bdf.bz2")
+
+		stream = bz2.BZ2File(self._path("sample.bdf.bz2"), 'rb')
+		try:
+			self.failUnless(stream.read().startswith("STARTFONT"))
+		finally:
+			stream.close()
+
+	def test_xz_files(self):
+		if util.lzma is None:
+			self.failUnlessRaises(IOError, util.open_font,
+					self._path("sample.bdf.xz"), 'w')
+		else:
+			self._round_trip("sample.bdf.xz")
+
+	def test_detection_by_content(self):
+		# A compressed file is recognised even if it's not named like one.
+		with gzip.GzipFile(self._path("sample.bdf"), 'wb') as stream:
+			stream.write(SAMPLE_FONT)
+
+		with util.open_font(self._path("sample.bdf")) as stream:
+			self.failUnlessEqual(stream.read(), SAMPLE_FONT)
+
+	def test_bad_mode(self):
+		self.failUnlessRaises(ValueError, util.open_font,
+				self._path("sample.bdf"), 'a')
@@ -4,7 +4,8 @@ try:
 except ImportError:
 	from StringIO import StringIO
 
-from bdflib import model, writer
+from bdflib import effects, model, reader, writer
+from bdflib.test.test_reader import SAMPLE_FONT
 
 class TestBDFWriter(unittest.TestCase):
 
@@ -243,3 +244,155 @@ class TestBDFWriter(unittest.TestCase):
 					% locals()
 				)
 
+
+	def test_chunked_output(self):
+		"""
+		Large fonts should be written in a few big chunks.
+		"""
+		glyphCount = writer.GLYPHS_PER_CHUNK * 2 + 1
+		for cp in range(glyphCount):
+			self.font.new_glyph_from_data("char%d" % cp, ["4", "8"],
+					0,0, 2,2, 3, cp)
+		self.font.new_glyph_from_data("empty", [], 0,0, 0,0, 3)
+
+		class CountingStream(object):
+			def __init__(self):
+				self.chunks = []
+			def write(self, data):
+				self.chunks.append(data)
+			def writelines(self, lines):
+				self.chunks.extend(lines)
+
+		stream = CountingStream()
+		writer.write_bdf(self.font, stream)
+
+		# The header, three chunks of glyphs and ENDFONT.
+		self.failUnlessEqual(len(stream.chunks), 5)
+
+		text = "".join(stream.chunks)
+		self.failUnlessEqual(text, writer.dumps(self.font))
+		self.failUnlessEqual(text.count("STARTCHAR"), glyphCount + 1)
+		self.failUnless(text.endswith(
+				"STARTCHAR empty\n"
+				"ENCODING -1\n"
+				"SWIDTH 176 0\n"
+				"DWIDTH 3 0\n"
+				"BBX 0 0 0 0\n"
+				"BITMAP\n"
+				"ENDCHAR\n"
+				"ENDFONT\n"
+			))
+
+	def test_changed_glyph_metrics(self):
+		"""
+		Changing a glyph's metrics directly should show up in the header.
+		"""
+		g = self.font.new_glyph_from_data("TestGlyph", ["FF"], 0,0, 8,1, 8,
+				65)
+		writer.dumps(self.font)
+
+		g.bbY = -3
+		text = writer.dumps(self.font)
+		self.failUnless("FONTBOUNDINGBOX 8 3 0 -3\n" in text)
+		self.failUnless("FONT_DESCENT 3\n" in text)
+
+		g.bbY = 0
+		g.bbW = 4
+		text = writer.dumps(self.font)
+		self.failUnless("FONTBOUNDINGBOX 4 1 0 0\n" in text)
+		self.failUnless("FONT_DESCENT 0\n" in text)
+
+	def test_streaming_writer(self):
+		"""
+		Writing glyphs from an iterator should match writing the whole font.
+		"""
+		self.font.new_glyph_from_data("TestGlyph1", ["4", "8"], 0,0, 2,2, 3, 5)
+		self.font.new_glyph_from_data("TestGlyph2", ["C0", "80"], -1,-3, 3,2,
+				3, 1)
+		self.font.new_glyph_from_data("TestGlyph3", ["4"], 1,4, 2,1, 3)
+
+		expected = StringIO()
+		writer.write_bdf(self.font, expected)
+
+		header = model.Font("TestFont", 12, 100,100)
+		stream = StringIO()
+		writer.write_bdf_streaming(header, (g for g in self.font.glyphs),
+				stream)
+		self.failUnlessEqual(stream.getvalue(), expected.getvalue())
+
+		# With no glyphs at all, the output should match an empty font.
+		expected = StringIO()
+		writer.write_bdf(header, expected)
+
+		stream = StringIO()
+		writer.write_bdf_streaming(header, iter([]), stream)
+		self.failUnlessEqual(stream.getvalue(), expected.getvalue())
+
+	def test_verbatim_glyphs(self):
+		"""
+		Unmodified glyphs should be copied out as they were read.
+		"""
+		font = reader.read_bdf(StringIO(SAMPLE_FONT), keep_source=True)
+		font[106].merge_glyph(font[106], 1,0)
+
+		stream = StringIO()
+		writer.write_bdf(font, stream)
+		output = stream.getvalue()
+
+		# The glyph we changed has been formatted again...
+		jStart = output.index("STARTCHAR j")
+		quoterightStart = output.index("STARTCHAR quoteright")
+		self.failIf("ATTRIBUTES" in output[jStart:quoterightStart])
+
+		# ...but the other one is exactly as it was in the original.
+		self.failUnlessEqual(output[quoterightStart:],
+				SAMPLE_FONT[SAMPLE_FONT.index("STARTCHAR quoteright"):]
+				+ "\n")
+
+	def test_verbatim_glyphs_other_size(self):
+		"""
+		Glyphs moved to a font of another pixel size need a new SWIDTH.
+		"""
+		font = reader.read_bdf(StringIO(SAMPLE_FONT), keep_source=True)
+		merged = effects.merge(font, model.Font("Other", 24, 100,100))
+		output = writer.dumps(merged)
+
+		self.failUnless("STARTCHAR j\nENCODING 106\nSWIDTH 235 0\n" in output)
+		self.failIf("SWIDTH 355 0" in output)
+
+		# The same goes for the worker processes.
+		self.failUnlessEqual(writer.dumps(merged, workers=2), output)
+
+	def test_rows_changed_in_place(self):
+		"""
+		Glyphs whose rows were changed in place shouldn't be copied out.
+		"""
+		font = reader.read_bdf(StringIO(SAMPLE_FONT), keep_source=True)
+		font[106].data[21] = 0x1C0
+
+		stream = StringIO()
+		writer.write_bdf(font, stream)
+		output = stream.getvalue()
+
+		self.failUnless("BITMAP\nE000\n0380\n" in output)
+
+	def test_parallel_writing(self):
+		"""
+		Formatting glyphs in worker processes should give the same output.
+		"""
+		for cp in range(writer.GLYPHS_PER_CHUNK + 10):
+			self.font.new_glyph_from_data("char%d" % cp,
+					["40", "%02X" % (cp % 256)], 0,cp % 3, 8,2, 3, cp)
+		self.font.new_glyph_from_data("empty", [], 0,0, 0,0, 3)
+		verbatim = self.font.new_glyph_from_data("verbatim", ["8"], 0,0, 1,1,
+				3, 100000)
+		verbatim.set_source("STARTCHAR verbatim\nBITMAP\n80\nENDCHAR\n")
+
+		expected = StringIO()
+		writer.write_bdf(self.font, expected)
+
+		stream = StringIO()
+		writer.write_bdf(self.font, stream, workers=2)
+		self.failUnlessEqual(stream.getvalue(), expected.getvalue())
+		self.failUnlessEqual(writer.dumps(self.font, workers=2),
+				expected.getvalue())
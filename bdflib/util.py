@@ -17,6 +17,34 @@
 """
 Useful classes and functions that don't fit anywhere else.
 """
+import bz2
+import contextlib
+import gc
+import gzip
+import io
+import os
+try:
+	import lzma
+except ImportError:
+	try:
+		from backports import lzma
+	except ImportError:
+		lzma = None
+
+# Magic numbers at the start of compressed files, and the kind of compression
+# each one indicates.
+COMPRESSION_MAGIC = [
+		("\x1f\x8b", "gzip"),
+		("BZh", "bz2"),
+		("\xfd7zXZ\x00", "xz"),
+	]
+
+# Filename extensions that indicate compressed files.
+COMPRESSION_EXTENSIONS = {
+		".gz": "gzip",
+		".bz2": "bz2",
+		".xz": "xz",
+	}
 
 class Tally(object):
 	"""
@@ -60,3 +88,71 @@ class Tally(object):
 		print "count %s" % self.itemname
 		for count, item in data:
 			print "%5d %s" % (count, formatter(item))
+
+
+@contextlib.contextmanager
+def gc_paused():
+	"""
+	Turn off the cyclic garbage collector for the duration of a with block.
+
+	Building many thousands of glyphs would otherwise trigger a full
+	collection every so often, each one scanning every glyph built so far.
+	The only reference cycles glyphs are part of are with their font, which
+	is still in use, so the collector would never find anything to free
+	anyway.
+	"""
+	wasEnabled = gc.isenabled()
+	gc.disable()
+	try:
+		yield
+	finally:
+		if wasEnabled:
+			gc.enable()
+
+
+def open_font(filename, mode='r', compresslevel=9):
+	"""
+	Open a font file, decompressing or compressing it on the fly.
+
+	mode should be 'r' or 'w'. When reading, gzip, bzip2 and xz files are
+	recognised by their contents, whatever they're called. When writing, the
+	compression is chosen by the extension of filename (.gz, .bz2 or .xz),
+	and compresslevel sets how hard to try. Other files are opened as usual.
+	Returns a file-like object suitable for reader.read_bdf() or
+	writer.write_bdf().
+	"""
+	if mode.startswith('r'):
+		with open(filename, 'rb') as stream:
+			magic = stream.read(6)
+		compression = None
+		for prefix, kind in COMPRESSION_MAGIC:
+			if magic.startswith(prefix):
+				compression = kind
+		mode = 'rb'
+	elif mode.startswith('w'):
+		extension = os.path.splitext(filename)[1]
+		compression = COMPRESSION_EXTENSIONS.get(extension)
+		mode = 'wb'
+	else:
+		raise ValueError("mode must be 'r' or 'w', not %r" % (mode,))
+
+	if compression is None:
+		return open(filename, mode)
+
+	elif compression == "gzip":
+		if mode == 'rb':
+			# GzipFile's own readline() is slow, so let a BufferedReader do
+			# the line-splitting.
+			return io.BufferedReader(gzip.GzipFile(filename, mode))
+		return gzip.GzipFile(filename, mode, compresslevel)
+
+	elif compression == "bz2":
+		return bz2.BZ2File(filename, mode, compresslevel=compresslevel)
+
+	elif lzma is None:
+		raise IOError("Can't open %r: xz support needs the lzma module"
+				% (filename,))
+	elif mode == 'rb':
+		return lzma.LZMAFile(filename, mode)
+	else:
+		return lzma.LZMAFile(filename, mode, preset=compresslevel)
@@ -17,7 +17,12 @@
 """
 Tools to write a Font object to a BDF File.
 """
-import math
+import itertools
+import marshal
+import multiprocessing
+import shutil
+import tempfile
+from bdflib import model
 
 def _quote_property_value(val):
 	if isinstance(val, int):
@@ -25,68 +30,249 @@ def _quote_property_value(val):
 	else:
 		return '"%s"' % (str(val).replace('"', '""'),)
 
-def write_bdf(font, stream):
-	"""
-	Write the given font object to the given stream as a BDF font.
+# How many glyphs to gather into each chunk of output.
+GLYPHS_PER_CHUNK = 1024
+
+# The BDF description of a glyph, up to and including BITMAP.
+_GLYPH_HEADER = ("STARTCHAR %s\nENCODING %d\nSWIDTH %d 0\nDWIDTH %d 0\n"
+		"BBX %d %d %d %d\nBITMAP\n")
+
+def _calculate_properties(font, bounding_box, max_codepoint):
 	"""
-	# The font bounding box is the union of glyph bounding boxes.
-	font_bbX = 0
-	font_bbY = 0
-	font_bbW = 0
-	font_bbH = 0
-	for g in font.glyphs:
-		new_bbX = min(font_bbX, g.bbX)
-		new_bbY = min(font_bbY, g.bbY)
-		new_bbW = max(font_bbX + font_bbW, g.bbX + g.bbW) - new_bbX
-		new_bbH = max(font_bbY + font_bbH, g.bbY + g.bbH) - new_bbY
+	Returns the properties to write for the given font.
 
-		(font_bbX, font_bbY, font_bbW, font_bbH) = (
-				new_bbX, new_bbY, new_bbW, new_bbH)
+	bounding_box is the font bounding box, and max_codepoint the highest
+	codepoint in the font (or -1 if no glyphs are encoded).
+	"""
+	font_bbX, font_bbY, font_bbW, font_bbH = bounding_box
 
 	# Calculated properties that aren't in the font model.
 	properties = {
-			"PIXEL_SIZE": int(math.ceil(
-				font["RESOLUTION_Y"] * font["POINT_SIZE"] / 72.0)),
+			"PIXEL_SIZE": font.get_pixel_size(),
 			"FONT_ASCENT": font_bbY + font_bbH,
 			"FONT_DESCENT": font_bbY * -1,
 		}
-	if len(font.glyphs_by_codepoint) > 0:
-		properties["DEFAULT_CHAR"] = max(font.glyphs_by_codepoint.keys())
+	if max_codepoint >= 0:
+		properties["DEFAULT_CHAR"] = max_codepoint
 	properties.update(font.properties)
 
 	# The POINT_SIZE property is actually in deci-points.
 	properties["POINT_SIZE"] = int(properties["POINT_SIZE"] * 10)
 
-	# Write the basic header.
-	stream.write("STARTFONT 2.1\n")
-	stream.write("FONT %s\n" % (font["FACE_NAME"],))
-	stream.write("SIZE %g %d %d\n" %
-			(font["POINT_SIZE"], font["RESOLUTION_X"], font["RESOLUTION_Y"]))
-	stream.write("FONTBOUNDINGBOX %d %d %d %d\n"
-			% (font_bbW, font_bbH, font_bbX, font_bbY))
+	return properties
+
+def font_properties(font):
+	"""
+	Returns the properties write_bdf() would write for the given font.
+
+	As well as the properties in the font model, these include the ones
+	calculated from the glyphs, such as FONT_ASCENT and DEFAULT_CHAR.
+	"""
+	return _calculate_properties(font, font.get_bounding_box(),
+			font.get_max_codepoint())
+
+def _font_header(font, bounding_box, glyph_count, max_codepoint):
+	"""
+	Returns the BDF header for the given font, up to and including CHARS.
+
+	bounding_box is the font bounding box, glyph_count the number of glyphs
+	that will follow, and max_codepoint the highest codepoint among them (or
+	-1 if none are encoded).
+	"""
+	font_bbX, font_bbY, font_bbW, font_bbH = bounding_box
+	properties = _calculate_properties(font, bounding_box, max_codepoint)
+
+	# The basic header.
+	res = [
+			"STARTFONT 2.1\n",
+			"FONT %s\n" % (font["FACE_NAME"],),
+			"SIZE %g %d %d\n" % (font["POINT_SIZE"], font["RESOLUTION_X"],
+				font["RESOLUTION_Y"]),
+			"FONTBOUNDINGBOX %d %d %d %d\n"
+				% (font_bbW, font_bbH, font_bbX, font_bbY),
+		]
 
-	# Write the properties
-	stream.write("STARTPROPERTIES %d\n" % (len(properties),))
+	# The properties
+	res.append("STARTPROPERTIES %d\n" % (len(properties),))
 	keys = sorted(properties.keys())
 	for key in keys:
-		stream.write("%s %s\n" % (key,
+		res.append("%s %s\n" % (key,
 			_quote_property_value(properties[key])))
-	stream.write("ENDPROPERTIES\n")
-
-	# Write out the glyphs
-	stream.write("CHARS %d\n" % (len(font.glyphs),))
-	for glyph in font.glyphs:
-		scalable_width = int(1000.0 * glyph.advance
-				/ properties["PIXEL_SIZE"])
-		stream.write("STARTCHAR %s\n" % (glyph.name,))
-		stream.write("ENCODING %d\n" % (glyph.codepoint,))
-		stream.write("SWIDTH %d 0\n" % (scalable_width,))
-		stream.write("DWIDTH %d 0\n" % (glyph.advance,))
-		stream.write("BBX %d %d %d %d\n"
-				% (glyph.bbW, glyph.bbH, glyph.bbX, glyph.bbY))
-		stream.write("BITMAP\n")
-		for row in glyph.get_data():
-			stream.write("%s\n" % (row,))
-		stream.write("ENDCHAR\n")
+	res.append("ENDPROPERTIES\n")
+
+	res.append("CHARS %d\n" % (glyph_count,))
+
+	return "".join(res)
+
+def _whole_font_header(font):
+	"""
+	Returns the BDF header for the given font and all its glyphs.
+	"""
+	return _font_header(font, font.get_bounding_box(), len(font.glyphs),
+			font.get_max_codepoint())
+
+def _glyph_chunk(glyphs, pixel_size):
+	"""
+	Returns the BDF descriptions of the given glyphs, as a single string.
+	"""
+	res = []
+	for glyph in glyphs:
+		# Glyphs that haven't changed since they were read can be copied
+		# straight out, as long as their SWIDTH still holds.
+		source = glyph.get_source(pixel_size)
+		if source is not None:
+			res.append(source)
+			continue
+
+		scalable_width = int(1000.0 * glyph.advance / pixel_size)
+		res.append(_GLYPH_HEADER % (glyph.name, glyph.codepoint,
+				scalable_width, glyph.advance, glyph.bbW, glyph.bbH,
+				glyph.bbX, glyph.bbY))
+		rows = glyph.get_data()
+		if rows:
+			res.append("\n".join(rows))
+			res.append("\n")
+		res.append("ENDCHAR\n")
+	return "".join(res)
+
+def _glyph_batches(glyphs):
+	"""
+	Yields lists of up to GLYPHS_PER_CHUNK glyphs from the given iterable.
+	"""
+	glyphs = iter(glyphs)
+	while True:
+		batch = list(itertools.islice(glyphs, GLYPHS_PER_CHUNK))
+		if not batch:
+			break
+		yield batch
+
+def _glyph_chunks(glyphs, pixel_size):
+	"""
+	Yields the BDF descriptions of the given glyphs, a chunk at a time.
+
+	Each chunk is a single string describing up to GLYPHS_PER_CHUNK glyphs,
+	so a stream gets a few large writes rather than one per line.
+	"""
+	for batch in _glyph_batches(glyphs):
+		yield _glyph_chunk(batch, pixel_size)
+
+def _glyph_chunks_parallel(glyphs, pixel_size, workers):
+	"""
+	Yields the same chunks as _glyph_chunks(), formatted by worker processes.
+	"""
+	# Glyph objects are slow to pickle, so send the workers their
+	# attributes, marshalled.
+	batches = [marshal.dumps([(g.name, list(g._data), g.bbX, g.bbY, g.bbW,
+			g.bbH, g.advance, g.codepoint, g.get_source(pixel_size))
+			for g in batch])
+			for batch in _glyph_batches(glyphs)]
+
+	pool = multiprocessing.Pool(workers)
+	try:
+		# imap() hands back the chunks in the order we gave them, so the
+		# output is the same as the serial writer's.
+		for chunk in pool.imap(_format_glyph_batch,
+				[(batch, pixel_size) for batch in batches]):
+			yield chunk
+	finally:
+		pool.terminate()
+		pool.join()
+
+def _format_glyph_batch(args):
+	"""
+	Format a batch of glyphs in a worker process.
+
+	This does the same as _glyph_chunk(), but works from the marshalled
+	attributes rather than rebuilding glyph objects.
+	"""
+	batch, pixel_size = args
+	res = []
+	for (name, data, bbX, bbY, bbW, bbH, advance, codepoint, source
+			) in marshal.loads(batch):
+		if source is not None:
+			res.append(source)
+			continue
+
+		scalable_width = int(1000.0 * advance / pixel_size)
+		res.append(_GLYPH_HEADER % (name, codepoint, scalable_width, advance,
+				bbW, bbH, bbX, bbY))
+		rows = model.encode_bitmap(data, bbW)
+		if rows:
+			res.append("\n".join(rows))
+			res.append("\n")
+		res.append("ENDCHAR\n")
+	return "".join(res)
+
+def _font_chunks(font, workers):
+	"""
+	Yields the whole BDF file for the given font, a chunk at a time.
+	"""
+	yield _whole_font_header(font)
+
+	if workers is not None and workers > 1:
+		chunks = _glyph_chunks_parallel(font.glyphs, font.get_pixel_size(),
+				workers)
+	else:
+		chunks = _glyph_chunks(font.glyphs, font.get_pixel_size())
+	for chunk in chunks:
+		yield chunk
+
+	yield "ENDFONT\n"
+
+def write_bdf(font, stream, workers=None):
+	"""
+	Write the given font object to the given stream as a BDF font.
+
+	If workers is more than 1, the glyphs are formatted in that many worker
+	processes. The output is exactly the same either way.
+	"""
+	stream.writelines(_font_chunks(font, workers))
+
+def dumps(font, workers=None):
+	"""
+	Returns the given font object as a string in BDF format.
+
+	workers is the same as for write_bdf().
+	"""
+	return "".join(_font_chunks(font, workers))
+
+def write_bdf_streaming(font, glyphs, stream):
+	"""
+	Write a BDF font to the given stream, taking the glyphs from an iterable.
+
+	font supplies the name, size, resolution, properties and comments; any
+	glyphs it holds are ignored. glyphs may be any iterable of glyph objects,
+	such as a generator, and is only gone through once, so the glyphs needn't
+	all be in memory at the same time. For example, the items after the
+	first from reader.iter_bdf() can be transformed and written out in
+	constant memory.
+
+	The header has to describe all the glyphs, so they're written to a
+	temporary file as they arrive and copied to stream at the end.
+	"""
+	pixel_size = font.get_pixel_size()
+	left, bottom, right, top = 0, 0, 0, 0
+	glyph_count = 0
+	max_codepoint = -1
+
+	spool = tempfile.TemporaryFile()
+	try:
+		for batch in _glyph_batches(glyphs):
+			for glyph in batch:
+				left = min(left, glyph.bbX)
+				bottom = min(bottom, glyph.bbY)
+				right = max(right, glyph.bbX + glyph.bbW)
+				top = max(top, glyph.bbY + glyph.bbH)
+				max_codepoint = max(max_codepoint, glyph.codepoint)
+			glyph_count += len(batch)
+			spool.write(_glyph_chunk(batch, pixel_size))
+
+		stream.write(_font_header(font,
+				(left, bottom, right - left, top - bottom),
+				glyph_count, max_codepoint))
+		spool.seek(0)
+		shutil.copyfileobj(spool, stream, 1024 * 1024)
+	finally:
+		spool.close()
 
 	stream.write("ENDFONT\n")
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+# bench_memory, a benchmark for the memory used by glyphs
+# Copyright (C) 2009, Timothy Alle
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure how much memory and time it takes to build a large font.
+
+Each run builds its font in a fresh process, so the memory figures aren't
+muddied by whatever the previous run left behind.
+"""
+
+import multiprocessing
+import random
+import resource
+import time
+from optparse import OptionParser
+
+from bdflib import model
+
+
+parser = OptionParser(usage="usage: %prog [options]")
+parser.add_option("--glyphs", type="int", default=50000,
+		help="Number of glyphs in the test font (default %default)")
+parser.add_option("--width", type="int", default=16,
+		help="Width of each glyph (default %default)")
+parser.add_option("--height", type="int", default=16,
+		help="Height of each glyph (default %default)")
+
+
+def _rss():
+	"""
+	Returns the peak memory used by this process so far, in bytes.
+	"""
+	# Linux reports this in kilobytes.
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def build(glyph_count, width, height):
+	"""
+	Returns the memory and time taken to build a font full of random glyphs.
+	"""
+	rand = random.Random(0)
+	digits = (width + 7) // 8 * 2
+	padding = digits * 4 - width
+	glyphs = [["%0*X" % (digits, rand.getrandbits(width) << padding)
+			for i in range(height)] for cp in range(glyph_count)]
+
+	before = _rss()
+	start = time.time()
+	font = model.Font("BenchFont", 12, 100,100)
+	for cp, data in enumerate(glyphs):
+		font.new_glyph_from_data("char%d" % cp, data, 0,-2, width,height,
+				width + 1, cp)
+	elapsed = time.time() - start
+
+	# Drop the hex strings, so only the font is left.
+	del glyphs
+	return _rss() - before, elapsed
+
+
+options, args = parser.parse_args()
+
+pool = multiprocessing.Pool(1)
+size, elapsed = pool.apply(build,
+		(options.glyphs, options.width, options.height))
+pool.terminate()
+
+print "Font: %d glyphs of %dx%d" % (options.glyphs, options.width,
+		options.height)
+print "Memory:       %8.1f MB (%d bytes per glyph)" % (size / 1048576.0,
+		size // options.glyphs)
+print "Construction: %8.3fs" % (elapsed,)
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+# bench_reader, a benchmark for the BDF readers
+# Copyright (C) 2009, Timothy Alle
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compare the speed of the BDF readers on a large synthetic font.
+"""
+
+import os
+import tempfile
+from optparse import OptionParser
+try:
+	from cStringIO import StringIO
+except ImportError:
+	from StringIO import StringIO
+
+from bdflib import model, packed, reader
+from benchutil import best_time, build_font
+
+
+def read_bdf_baseline(iterable):
+	"""
+	Read a font the way bdflib's first reader did, for comparison.
+
+	That's one line at a time, with a keyword comparison chain for each
+	line, and each bitmap row decoded on its own into a list.
+	"""
+	iterable = iter(iterable)
+	font = None
+	for line in iterable:
+		parts = line.strip().split(' ')
+		key = parts[0]
+		if key == "SIZE":
+			font = model.Font("", float(parts[1]), int(parts[2]),
+					int(parts[3]))
+		elif key == "CHARS":
+			for i in range(int(parts[1])):
+				_read_glyph_baseline(iterable, font)
+			break
+	return font
+
+
+def _read_glyph_baseline(iterable, font):
+	name = ""
+	codepoint = -1
+	bbX = bbY = bbW = bbH = advance = 0
+	data = []
+	for line in iterable:
+		parts = line.strip().split(' ')
+		key = parts[0]
+		values = parts[1:]
+
+		if key == "STARTCHAR":
+			name = " ".join(values)
+		elif key == "ENCODING":
+			codepoint = int(values[0])
+		elif key == "DWIDTH":
+			advance = int(values[0])
+		elif key == "BBX":
+			bbW, bbH, bbX, bbY = [int(val) for val in values]
+		elif key == "BITMAP":
+			for i in range(bbH):
+				row = iterable.next().strip()
+				data.append(int(row, 16) >> (len(row) * 4 - bbW))
+			data.reverse()
+			assert iterable.next().strip() == "ENDCHAR"
+			break
+
+	glyph = model.Glyph(name, None, bbX, bbY, bbW, bbH, advance, codepoint)
+	glyph.data = data
+	font.add_glyph(glyph)
+
+
+parser = OptionParser(usage="usage: %prog [options]")
+parser.add_option("--glyphs", type="int", default=50000,
+		help="Number of glyphs in the test font (default %default)")
+parser.add_option("--width", type="int", default=16,
+		help="Width of each glyph (default %default)")
+parser.add_option("--height", type="int", default=16,
+		help="Height of each glyph (default %default)")
+parser.add_option("--workers", type="int", default=0,
+		help="Also time read_bdf with this many worker processes")
+parser.add_option("--repeat", type="int", default=3,
+		help="Number of times to run each reader (default %default)")
+
+options, args = parser.parse_args()
+
+data = build_font(options.glyphs, options.width, options.height)
+print "Font: %d glyphs of %dx%d, %d bytes" % (options.glyphs, options.width,
+		options.height, len(data))
+
+handle, packedPath = tempfile.mkstemp(suffix=".pack")
+with os.fdopen(handle, 'wb') as stream:
+	packed.write_packed(reader.read_bdf_bytes(data), stream)
+
+def read_packed(unpack):
+	with open(packedPath, 'rb') as stream:
+		font = packed.read_packed(stream)
+	if unpack:
+		for g in font.glyphs:
+			g.data
+
+readers = [
+		("baseline reader", lambda: read_bdf_baseline(StringIO(data))),
+		("read_bdf", lambda: reader.read_bdf(StringIO(data))),
+		("read_bdf_bytes", lambda: reader.read_bdf_bytes(data)),
+		("read_packed", lambda: read_packed(False)),
+		("read_packed (unpacked)", lambda: read_packed(True)),
+	]
+if options.workers > 1:
+	readers.append(("read_bdf (%d workers)" % options.workers,
+			lambda: reader.read_bdf(StringIO(data), workers=options.workers)))
+
+baseline = None
+for name, func in readers:
+	elapsed = best_time(func, options.repeat)
+	if baseline is None:
+		baseline = elapsed
+	print "%-24s %8.3fs %6.2fx" % (name, elapsed, baseline / elapsed)
+
+os.unlink(packedPath)
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+# bench_writer, a benchmark for the BDF writer
+# Copyright (C) 2009, Timothy Alle
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Time the BDF writer on a large synthetic font.
+"""
+
+import os
+from optparse import OptionParser
+try:
+	from cStringIO import StringIO
+except ImportError:
+	from StringIO import StringIO
+
+from bdflib import reader, writer
+from benchutil import best_time, build_font
+
+
+class CountingStream(object):
+	"""
+	A stream that counts the calls made to write to it.
+	"""
+
+	def __init__(self, stream):
+		self.stream = stream
+		self.calls = 0
+
+	def write(self, data):
+		self.calls += 1
+		self.stream.write(data)
+
+	def writelines(self, lines):
+		for line in lines:
+			self.write(line)
+
+
+parser = OptionParser(usage="usage: %prog [options]")
+parser.add_option("--glyphs", type="int", default=50000,
+		help="Number of glyphs in the test font (default %default)")
+parser.add_option("--width", type="int", default=16,
+		help="Width of each glyph (default %default)")
+parser.add_option("--height", type="int", default=16,
+		help="Height of each glyph (default %default)")
+parser.add_option("--workers", type="int", default=0,
+		help="Also time write_bdf with this many worker processes")
+parser.add_option("--repeat", type="int", default=3,
+		help="Number of times to run each writer (default %default)")
+
+options, args = parser.parse_args()
+
+font = reader.read_bdf_bytes(build_font(options.glyphs, options.width,
+		options.height))
+
+counter = CountingStream(StringIO())
+writer.write_bdf(font, counter)
+print "Font: %d glyphs of %dx%d, %d write() calls" % (options.glyphs,
+		options.width, options.height, counter.calls)
+
+# An unbuffered file makes a system call for every write, like a socket
+# would.
+unbuffered = open(os.devnull, 'wb', 0)
+
+writers = [
+		("write_bdf (StringIO)", lambda: writer.write_bdf(font, StringIO())),
+		("write_bdf (unbuffered)",
+			lambda: writer.write_bdf(font, unbuffered)),
+		("dumps", lambda: writer.dumps(font)),
+	]
+if options.workers > 1:
+	writers.append(("write_bdf (%d workers)" % options.workers,
+			lambda: writer.write_bdf(font, StringIO(),
+				workers=options.workers)))
+
+for name, func in writers:
+	print "%-24s %8.3fs" % (name, best_time(func, options.repeat))
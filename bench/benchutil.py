@@ -0,0 +1,60 @@
+# benchutil, helpers shared by the bdflib benchmarks
+# Copyright (C) 2009, Timothy Alle
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Helpers shared by the benchmarks.
+"""
+
+import random
+import time
+try:
+	from cStringIO import StringIO
+except ImportError:
+	from StringIO import StringIO
+
+from bdflib import model, writer
+
+
+def build_font(glyph_count, width, height):
+	"""
+	Returns a BDF-format string for a font full of random glyphs.
+	"""
+	rand = random.Random(0)
+	digits = (width + 7) // 8 * 2
+	font = model.Font("BenchFont", 12, 100,100)
+	for cp in range(glyph_count):
+		data = ["%0*X" % (digits, rand.getrandbits(digits * 4))
+				for i in range(height)]
+		font.new_glyph_from_data("char%d" % cp, data, 0,-2, width,height,
+				width + 1, cp)
+
+	stream = StringIO()
+	writer.write_bdf(font, stream)
+	return stream.getvalue()
+
+
+def best_time(func, repeat):
+	"""
+	Returns the shortest time func() took to run out of repeat tries.
+	"""
+	res = None
+	for i in range(repeat):
+		start = time.time()
+		func()
+		elapsed = time.time() - start
+		if res is None or elapsed < res:
+			res = elapsed
+	return res
@@ -37,6 +37,7 @@ setup(
 		url='http://gitorious.org/projects/bdflib/pages/Home',
 		packages=['bdflib', 'bdflib.test'],
 		scripts=[
+			'bin/bdflib-bdftopcf',
 			'bin/bdflib-embolden',
 			'bin/bdflib-fill',
 			'bin/bdflib-merge',